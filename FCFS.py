@@ -1,140 +1,91 @@
-import networkx as nx
-import math
-import csv
-
-# 1. Hàm tính khoảng cách Haversine
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-# 2. Đọc đồ thị và thiết lập capacity theo khoảng cách
+from admission import AdmissionEngine, ShortestPathTrees
+from demand_stream import iter_demand_batches, iter_demands
+from instrumentation import PROFILER
+from link_stats import LinkStats
+from path_index import load_path_index
+from results_store import write_results
+from topology_cache import load_topology
+
+# 1. Đọc đồ thị và thiết lập capacity theo khoảng cách (NetworkState)
 print("Đang đọc đồ thị từ AttMpls.gml...")
-G = nx.read_gml(r'D:/InformationNetwork/AttMpls.gml', label='id')
+with PROFILER.phase('load_topology'):
+    state = load_topology(r'D:/InformationNetwork/AttMpls.gml')
+    G = state.to_graph()
 
-for u, v, data in G.edges(data=True):
-    node_u = G.nodes[u]
-    node_v = G.nodes[v]
-    lat1, lon1 = node_u['Latitude'], node_u['Longitude']
-    lat2, lon2 = node_v['Latitude'], node_v['Longitude']
-    
-    distance = haversine(lat1, lon1, lat2, lon2)
-    data['distance'] = distance
-    
-    # Capacity theo khoảng cách (ĐÚNG ĐỀ BÀI)
-    if distance <= 1000:
-        capacity = 100
-    elif distance <= 2000:
-        capacity = 200
-    else:
-        capacity = 300
-    
-    data['capacity'] = capacity
-    data['flow'] = 0.0
-    data['residual'] = capacity
-    data['demandsID'] = []
+# Thống kê utilization cập nhật tăng dần theo mỗi lần reserve
+stats = state.attach(LinkStats(state))
+
+# Chỉ mục top-k đường ứng viên theo cặp node (dùng lại giữa các lần chạy)
+with PROFILER.phase('load_path_index'):
+    path_index = load_path_index(state, r'D:/InformationNetwork/AttMpls.gml')
 
-# 3. Đọc demands từ file CSV (giữ NGUYÊN thứ tự)
+# 2. Đọc demands từ file CSV theo từng batch (giữ NGUYÊN thứ tự, không nạp hết vào bộ nhớ)
 print("Đang đọc demands từ AttDemand.csv...")
-demands = []
-with open('D:/InformationNetwork/AttDemand.csv', 'r') as f:
-    reader = csv.reader(f)
-    next(reader)  # Bỏ header
-    
-    for row in reader:
-        if not row or row[0].startswith('#'):
-            continue
-        
-        seq = int(row[0])
-        source = int(row[1])
-        target = int(row[2])
-        bandwidth = float(row[3])
-        demands.append((seq, source, target, bandwidth))
-
-print(f"Đã đọc {len(demands)} demands từ file")
-print(f"Tổng bandwidth demand: {sum(bw for _, _, _, bw in demands):.1f} Mbps")
-
-# 4. Hàm FCFS - xử lý theo thứ tự từ trên xuống dưới
-def fcfs_process_demands(demands_list, graph):
-    """Xử lý demands theo FCFS (First-Come-First-Served)"""
+demand_batches = iter_demand_batches(r'D:/InformationNetwork/AttDemand.csv')
+
+# 3. Hàm FCFS - xử lý theo thứ tự từ trên xuống dưới
+def fcfs_process_demands(demand_batches, state, path_index=None, stats=None):
+    """Xử lý demands theo FCFS (First-Come-First-Served) trên NetworkState, đọc từ stream batch"""
     print("\n" + "="*60)
     print("PHƯƠNG PHÁP: FCFS (First-Come-First-Served)")
     print("="*60)
     
-    # Reset đồ thị
-    for u, v, data in graph.edges(data=True):
-        data['flow'] = 0.0
-        data['residual'] = data['capacity']
-        data['demandsID'] = []
+    # Reset trạng thái mạng
+    state.reset()
+    # Cây đường đi ngắn nhất dùng chung cho các demand cùng source (thay Dijkstra từng cặp)
+    engine = AdmissionEngine(state, path_index, ShortestPathTrees(state))
+    stats = stats or state.attach(LinkStats(state))
     
     accepted = []
     rejected = []
+    num_demands = 0
+    total_demand_bw = 0.0
     
     # Xử lý demands theo đúng thứ tự từ file
-    for seq, source, target, bandwidth in demands_list:
+    for seq, source, target, bandwidth in iter_demands(demand_batches):
+        num_demands += 1
+        total_demand_bw += bandwidth
+        
         # Kiểm tra nếu source và target tồn tại trong đồ thị
-        if source not in graph.nodes() or target not in graph.nodes():
+        if source not in state.node_index or target not in state.node_index:
             rejected.append((seq, source, target, bandwidth, "Node không tồn tại"))
             continue
         
-        # Tìm đường đi ngắn nhất có đủ bandwidth
-        try:
-            # Tạo đồ thị tạm chỉ chứa các cạnh có đủ residual
-            temp_graph = graph.copy()
-            edges_to_remove = []
-            for u, v, data in temp_graph.edges(data=True):
-                if data['residual'] < bandwidth:
-                    edges_to_remove.append((u, v))
-            
-            # Xóa các cạnh không đủ bandwidth
-            temp_graph.remove_edges_from(edges_to_remove)
-            
-            # Tìm đường đi ngắn nhất
-            path = nx.shortest_path(temp_graph, source, target, weight='distance')
-            
-            # Nếu tìm được đường, cập nhật flow
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i + 1]
-                if not graph.has_edge(u, v):
-                    u, v = v, u
-                
-                graph[u][v]['residual'] -= bandwidth
-                graph[u][v]['flow'] += bandwidth
-                graph[u][v]['demandsID'].append(seq)
-            
+        # Tìm đường đi ngắn nhất có đủ bandwidth (Dijkstra bỏ qua link thiếu residual)
+        with PROFILER.demand(seq):
+            path = engine.admit(seq, source, target, bandwidth)
+        if path is not None:
             accepted.append((seq, source, target, bandwidth, path))
-            
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
+        else:
             rejected.append((seq, source, target, bandwidth, "Không tìm thấy đường đi đủ bandwidth"))
+    # Cây đường đi chỉ dùng trong lần chạy này: bỏ observer khỏi state
+    state.detach(engine.trees)
+    
+    print(f"Đã đọc {num_demands} demands từ file")
+    print(f"Tổng bandwidth demand: {total_demand_bw:.1f} Mbps")
     
     # Tính toán kết quả
-    total_demand_bw = sum(bw for _, _, _, bw in demands_list)
     total_accepted_bw = sum(bw for _, _, _, bw, _ in accepted)
     
     # Đếm link > 70% utilization
-    high_util_links = []
-    for u, v, data in graph.edges(data=True):
-        if data['capacity'] > 0:
-            util = data['flow'] / data['capacity']
-            if util > 0.7:
-                high_util_links.append((u, v, util))
+    high_util_links = stats.hot_links()
     
-    print(f"Số demands được chấp nhận (N): {len(accepted)}/{len(demands_list)}")
-    print(f"Tỷ lệ chấp nhận: {len(accepted)/len(demands_list)*100:.1f}%")
+    print(f"Số demands được chấp nhận (N): {len(accepted)}/{num_demands}")
+    print(f"Tỷ lệ chấp nhận: {len(accepted)/num_demands*100:.1f}%")
     print(f"Bandwidth được chấp nhận: {total_accepted_bw:.1f}/{total_demand_bw:.1f} Mbps")
     print(f"Tỷ lệ bandwidth: {total_accepted_bw/total_demand_bw*100:.1f}%")
     print(f"Liên kết >70% capacity: {len(high_util_links)}")
     
     return accepted, rejected, high_util_links, total_accepted_bw
 
-# 5. Chạy FCFS với demands nguyên bản
-accepted, rejected, high_util, total_bw = fcfs_process_demands(demands, G)
+# 4. Chạy FCFS với demands nguyên bản
+with PROFILER.phase('admission'):
+    accepted, rejected, high_util, total_bw = fcfs_process_demands(demand_batches, state, path_index, stats)
+path_index.save()
+num_demands = len(accepted) + len(rejected)
+state.write_back(G)
 
-# 6. Hiển thị kết quả chi tiết
+# 5. Hiển thị kết quả chi tiết
 print("\n" + "="*60)
 print("KẾT QUẢ CHI TIẾT FCFS")
 print("="*60)
@@ -157,35 +108,18 @@ if rejected and len(rejected) > 0:
     for seq, source, target, bandwidth, reason in rejected[:10]:
         print(f"{seq:<5} {source:<8} {target:<8} {bandwidth:<12.1f} {reason}")
 
-# 7. Phân tích utilization
+# 6. Phân tích utilization
 print("\n" + "="*60)
 print("PHÂN TÍCH UTILIZATION MẠNG")
 print("="*60)
 
-# Tính average utilization
-total_util = 0
-count = 0
-util_dist = {'0-30%': 0, '30-70%': 0, '70-100%': 0}
-
-for u, v, data in G.edges(data=True):
-    if data['capacity'] > 0:
-        util = data['flow'] / data['capacity']
-        total_util += util
-        count += 1
-        
-        util_pct = util * 100
-        if util_pct <= 30:
-            util_dist['0-30%'] += 1
-        elif util_pct <= 70:
-            util_dist['30-70%'] += 1
-        else:
-            util_dist['70-100%'] += 1
-
-avg_util = (total_util / count * 100) if count > 0 else 0
+# Average utilization và phân bố lấy từ thống kê tăng dần (không duyệt lại các link)
+util_dist = stats.distribution()
+avg_util = stats.average() * 100
 print(f"Average link utilization: {avg_util:.1f}%")
 
 # Tổng capacity mạng
-total_capacity = sum(data['capacity'] for _, _, data in G.edges(data=True))
+total_capacity = state.capacity.sum()
 print(f"Tổng network capacity: {total_capacity:.0f} Mbps")
 print(f"Hiệu suất sử dụng capacity: {total_bw/total_capacity*100:.1f}%")
 
@@ -194,12 +128,12 @@ for range_name, cnt in util_dist.items():
     perc = cnt / G.number_of_edges() * 100
     print(f"  {range_name}: {cnt} links ({perc:.1f}%)")
 
-# 8. Lưu kết quả vào file
-with open('FCFS_result.txt', 'w', encoding='utf-8') as f:
+# 7. Lưu kết quả vào file
+with PROFILER.phase('report'), open('FCFS_result.txt', 'w', encoding='utf-8') as f:
     f.write("KẾT QUẢ FCFS (First-Come-First-Served)\n")
     f.write("="*50 + "\n")
-    f.write(f"Số demands được chấp nhận (N): {len(accepted)}/{len(demands)}\n")
-    f.write(f"Tỷ lệ chấp nhận: {len(accepted)/len(demands)*100:.1f}%\n")
+    f.write(f"Số demands được chấp nhận (N): {len(accepted)}/{num_demands}\n")
+    f.write(f"Tỷ lệ chấp nhận: {len(accepted)/num_demands*100:.1f}%\n")
     f.write(f"Bandwidth accepted: {total_bw:.1f} Mbps\n")
     f.write(f"Average utilization: {avg_util:.1f}%\n")
     f.write(f"Links >70%: {len(high_util)}\n\n")
@@ -211,10 +145,16 @@ with open('FCFS_result.txt', 'w', encoding='utf-8') as f:
     
     
 
+# Kết quả dạng cột (demands, path theo edge id, flow từng link) cho phân tích tiếp theo
+all_demands = sorted([d[:4] for d in accepted] + [d[:4] for d in rejected])
+with PROFILER.phase('write_results'):
+    results_path = write_results('FCFS_result', state, all_demands,
+                                 reasons={d[0]: d[4] for d in rejected}, metadata={'method': 'FCFS'})
+
 print("\n" + "="*60)
 print("KẾT LUẬN FCFS:")
 print("="*60)
 print(f"Với phương pháp FCFS (xử lý theo thứ tự từ trên xuống dưới):")
 print(f"• Số demands có thể được chấp nhận: N = {len(accepted)} demands")
-print(f"• Tỷ lệ thành công: {len(accepted)/len(demands)*100:.1f}%")
-print(f"• Kết quả đã lưu vào: FCFS_result.txt")
\ No newline at end of file
+print(f"• Tỷ lệ thành công: {len(accepted)/num_demands*100:.1f}%")
+print(f"• Kết quả đã lưu vào: FCFS_result.txt, {results_path}")
\ No newline at end of file
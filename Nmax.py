@@ -1,144 +1,132 @@
-import networkx as nx
-import math
-import csv
-import matplotlib.pyplot as plt
+import os
 from collections import defaultdict
-from itertools import islice
+import numpy as np
+from admission import widest_paths
+from demand_stream import load_demands
+from instrumentation import PROFILER
+from ksp import KShortestPaths
+from link_stats import LinkStats
+from maxflow import MaxFlowSplitter
+from network_state import NetworkState
+from path_index import PathIndex, load_path_index
+from rendering import finish, nmax_figure, snapshot
+from results_store import write_results
+from topology_cache import load_topology
 
-# 1. Hàm tính khoảng cách Haversine
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+# Cách chọn đường khi chia bandwidth: 'ksp' (Yen + smart_weight), 'widest' (các đường rộng nhất liên tiếp)
+# hoặc 'maxflow' (max-flow giới hạn ở bandwidth rồi phân rã thành ít đường nhất)
+ROUTING_MODES = ('ksp', 'widest', 'maxflow')
+ROUTING_MODE = os.environ.get('INFONET_NMAX_ROUTING', 'ksp')
 
-# 2. Khởi tạo đồ thị với capacity THEO KHOẢNG CÁCH
-def init_graph_with_distance_capacity(graph):
+# 1. Khởi tạo trạng thái mạng với capacity THEO KHOẢNG CÁCH
+def init_graph_with_distance_capacity(graph, state=None):
     print("Khởi tạo capacity theo khoảng cách...")
     
-    for u, v, data in graph.edges(data=True):
-        node_u = graph.nodes[u]
-        node_v = graph.nodes[v]
-        lat1, lon1 = node_u['Latitude'], node_u['Longitude']
-        lat2, lon2 = node_v['Latitude'], node_v['Longitude']
-        
-        distance = haversine(lat1, lon1, lat2, lon2)
-        data['distance'] = distance
-        
-        # CAPACITY THEO KHOẢNG CÁCH (TUÂN THỦ ĐỀ BÀI)
-        if distance <= 1000:
-            capacity = 100
-        elif distance <= 2000:
-            capacity = 200
-        else:  # distance <= 3000
-            capacity = 300
-        
-        data['capacity'] = capacity
-        data['flow'] = 0.0
-        data['residual'] = capacity
-        data['demandsID'] = []
+    if state is None:
+        state = NetworkState.from_graph(graph)
     
     # Tính tổng capacity
-    total_cap = sum(data['capacity'] for _, _, data in graph.edges(data=True))
+    total_cap = state.capacity.sum()
     print(f"Tổng capacity mạng: {total_cap:.0f} Mbps")
     
-    # Phân bố capacity
-    cap_100 = sum(1 for _, _, data in graph.edges(data=True) if data['capacity'] == 100)
-    cap_200 = sum(1 for _, _, data in graph.edges(data=True) if data['capacity'] == 200)
-    cap_300 = sum(1 for _, _, data in graph.edges(data=True) if data['capacity'] == 300)
+    # Phân bố capacity (đếm một lần)
+    tiers = LinkStats(state).capacity_counts
+    cap_100, cap_200, cap_300 = tiers[100], tiers[200], tiers[300]
     
     print(f"Liên kết 100Mbps: {cap_100}, 200Mbps: {cap_200}, 300Mbps: {cap_300}")
     
-    return graph
+    return state
 
-# 3. Smart Multi-path Routing với bandwidth splitting
-def smart_multipath_routing(graph, source, target, bandwidth, max_paths=3):
-    """Tìm nhiều đường đi và chia bandwidth thông minh"""
-    if source not in graph.nodes() or target not in graph.nodes():
+# 2. Smart Multi-path Routing với bandwidth splitting
+def smart_weight(state):
+    """Trọng số ưu tiên link có nhiều residual và ít utilization"""
+    # Link càng nhiều residual càng được ưu tiên (link hỏng, capacity 0, coi như đã đầy)
+    residual_ratio = np.zeros(state.num_edges)
+    np.divide(state.residual, state.capacity, out=residual_ratio, where=state.capacity > 0)
+    return state.distance * (2 - residual_ratio)
+
+def smart_multipath_routing(state, source, target, bandwidth, max_paths=3, ksp=None, mode=None, splitter=None):
+    """Tìm nhiều đường đi và chia bandwidth thông minh.
+    
+    mode: 'ksp', 'widest' hoặc 'maxflow' (mặc định ROUTING_MODE, đặt bằng INFONET_NMAX_ROUTING).
+    splitter: MaxFlowSplitter dùng lại giữa các demand (mode 'maxflow').
+    Trả về list (path, edge ids, bandwidth cấp phát) hoặc None.
+    """
+    if source not in state.node_index or target not in state.node_index:
         return None
+    mode = mode or ROUTING_MODE
+    if mode in ('widest', 'maxflow'):
+        s, t = state.node_index[source], state.node_index[target]
+        with PROFILER.phase('candidates'):
+            if mode == 'widest':
+                # Mỗi lần một Dijkstra bottleneck: đường rộng nhất trên residual đã trừ phần cấp phát trước
+                found, remaining_bw = widest_paths(state, s, t, bandwidth, max_paths)
+            else:
+                splitter = splitter or MaxFlowSplitter(state, attach=False)
+                found, remaining_bw = splitter.split(s, t, bandwidth, max_paths)
+        paths = [([state.nodes[i] for i in nodes], eids, allocate) for nodes, eids, allocate in found]
+        return paths if paths and remaining_bw <= bandwidth * 0.1 else None
+    if mode not in ROUTING_MODES:
+        raise ValueError(f"Không có mode '{mode}', chọn một trong {ROUTING_MODES}")
+    if ksp is None:
+        ksp = KShortestPaths(state, max_paths * 4, weight=smart_weight)
     
     paths = []
     remaining_bw = bandwidth
     
-    # Tạo đồ thị tạm với trọng số ưu tiên link có nhiều residual
-    temp_graph = graph.copy()
-    for u, v, data in temp_graph.edges(data=True):
-        if data['residual'] < 1:  # Hết capacity
-            temp_graph[u][v]['smart_weight'] = float('inf')
-        else:
-            # Ưu tiên link có nhiều residual và ít utilization
-            util = data['flow'] / data['capacity'] if data['capacity'] > 0 else 0
-            # Link càng nhiều residual càng được ưu tiên
-            residual_ratio = data['residual'] / data['capacity']
-            temp_graph[u][v]['smart_weight'] = data['distance'] * (2 - residual_ratio)
+    # Tìm k đường đi tốt nhất (Yen trên NetworkState, bỏ qua link hết capacity: residual < 1)
+    with PROFILER.phase('candidates'):
+        candidates = ksp.paths(state.node_index[source], state.node_index[target], bandwidth=1)
     
-    # Tìm k đường đi tốt nhất
-    try:
-        # Sử dụng k-shortest paths
-        path_generator = nx.shortest_simple_paths(temp_graph, source, target, weight='smart_weight')
+    found_paths = 0
+    used = defaultdict(float)  # Bandwidth đã chia cho các path trước trên từng link (chưa reserve)
+    for _, nodes, eids in candidates[:max_paths * 4]:  # Tìm nhiều path
+        if remaining_bw <= 0 or found_paths >= max_paths:
+            break
         
-        found_paths = 0
-        for path in islice(path_generator, max_paths * 4):  # Tìm nhiều path
-            if remaining_bw <= 0 or found_paths >= max_paths:
-                break
-            
-            # Tính bandwidth tối đa trên path này
-            max_on_path = float('inf')
-            for i in range(len(path) - 1):
-                u, v = path[i], path[i+1]
-                if not graph.has_edge(u, v):
-                    u, v = v, u
-                max_on_path = min(max_on_path, graph[u][v]['residual'])
-            
-            if max_on_path > 0:
-                # Chia bandwidth: ưu tiên lấy nhiều nhất có thể từ path này
-                allocate = min(remaining_bw, max_on_path)
-                if allocate > 0:
-                    paths.append((path, allocate))
-                    remaining_bw -= allocate
-                    found_paths += 1
-    except:
-        # Fallback: tìm 1 đường đi duy nhất
-        try:
-            single_path = nx.shortest_path(temp_graph, source, target, weight='smart_weight')
-            max_on_path = min(graph[u][v]['residual'] for i in range(len(single_path)-1) 
-                            for u, v in [(single_path[i], single_path[i+1])])
-            if max_on_path >= bandwidth:
-                return [(single_path, bandwidth)]
-        except:
-            return None
+        # Tính bandwidth tối đa trên path này (trừ phần đã chia cho các path trước dùng chung link)
+        max_on_path = min(state.residual[e] - used[e] for e in eids) if eids else 0
+        
+        if max_on_path > 0:
+            # Chia bandwidth: ưu tiên lấy nhiều nhất có thể từ path này
+            allocate = min(remaining_bw, max_on_path)
+            if allocate > 0:
+                paths.append(([state.nodes[i] for i in nodes], eids, allocate))
+                remaining_bw -= allocate
+                found_paths += 1
+                for e in eids:
+                    used[e] += allocate
     
     return paths if remaining_bw <= bandwidth * 0.1 else None  # Cho phép 10% không allocate
 
-# 4. Xử lý demands với strategic ordering
-def process_demands_strategic(demands, graph):
+# 3. Xử lý demands với strategic ordering
+def process_demands_strategic(demands, state, path_index=None, stats=None):
     """Xử lý demands với chiến lược thông minh để đạt 200/200"""
     print("\nXử lý demands với chiến lược tối ưu...")
     
-    # Reset đồ thị
-    for u, v, data in graph.edges(data=True):
-        data['flow'] = 0.0
-        data['residual'] = data['capacity']
-        data['demandsID'] = []
+    # Reset trạng thái mạng
+    state.reset()
+    stats = stats or state.attach(LinkStats(state))
     
     # PHÂN TÍCH DEMANDS để sắp xếp thông minh
     print("Phân tích demands pattern...")
     
     # Tính độ khó của mỗi demand (dựa trên shortest path length và bandwidth)
+    if path_index is None:
+        path_index = PathIndex(state)
     demand_difficulty = []
     for seq, source, target, bandwidth in demands:
-        try:
-            # Tìm shortest path
-            path = nx.shortest_path(graph, source, target, weight='distance')
-            hops = len(path) - 1
+        # Shortest path lấy từ chỉ mục đường ứng viên (không giới hạn residual)
+        candidates = []
+        if source in state.node_index and target in state.node_index:
+            candidates = path_index.candidates(state.node_index[source], state.node_index[target])
+        if candidates:
+            hops = len(candidates[0])
             
             # Độ khó = bandwidth * số hops
             difficulty = bandwidth * hops
             demand_difficulty.append((seq, source, target, bandwidth, difficulty, hops))
-        except:
+        else:
             demand_difficulty.append((seq, source, target, bandwidth, float('inf'), float('inf')))
     
     # CHIẾN LƯỢC: Xử lý theo thứ tự ưu tiên
@@ -146,26 +134,26 @@ def process_demands_strategic(demands, graph):
     # 2. Demands khó sau
     sorted_demands = sorted(demand_difficulty, key=lambda x: (x[3], x[4]))  # BW nhỏ, độ khó thấp
     
+    # Engine k-shortest paths dùng chung, cache tập đường ứng viên theo cặp (source, target)
+    ksp = KShortestPaths(state, k=12, weight=smart_weight)
+    splitter = MaxFlowSplitter(state) if ROUTING_MODE == 'maxflow' else None
+    
     accepted = []
     rejected_first = []
     
     print("Vòng 1: Xử lý demands dễ...")
     for seq, source, target, bandwidth, difficulty, hops in sorted_demands:
         # Thử multi-path routing
-        paths = smart_multipath_routing(graph, source, target, bandwidth)
+        with PROFILER.demand(seq):
+            paths = smart_multipath_routing(state, source, target, bandwidth, ksp=ksp, splitter=splitter)
         
         if paths:
             # Allocate bandwidth
             total_allocated = 0
-            for path, allocated_bw in paths:
-                total_allocated += allocated_bw
-                for i in range(len(path)-1):
-                    u, v = path[i], path[i+1]
-                    if not graph.has_edge(u, v):
-                        u, v = v, u
-                    graph[u][v]['residual'] -= allocated_bw
-                    graph[u][v]['flow'] += allocated_bw
-                    graph[u][v]['demandsID'].append(seq)
+            with PROFILER.phase('reserve'):
+                for path, eids, allocated_bw in paths:
+                    total_allocated += allocated_bw
+                    state.reserve(eids, allocated_bw, seq)
             
             accepted.append((seq, source, target, bandwidth, len(paths), hops))
         else:
@@ -181,23 +169,22 @@ def process_demands_strategic(demands, graph):
         # Thử với bandwidth giảm dần
         for reduced_factor in [0.8, 0.7, 0.6]:  # Giảm 20%, 30%, 40%
             reduced_bw = bandwidth * reduced_factor
-            paths = smart_multipath_routing(graph, source, target, reduced_bw)
+            with PROFILER.demand(seq):
+                paths = smart_multipath_routing(state, source, target, reduced_bw, ksp=ksp, splitter=splitter)
             
             if paths:
                 # Allocate với bandwidth giảm
-                for path, allocated_bw in paths:
-                    for i in range(len(path)-1):
-                        u, v = path[i], path[i+1]
-                        if not graph.has_edge(u, v):
-                            u, v = v, u
-                        
-                        graph[u][v]['residual'] -= allocated_bw
-                        graph[u][v]['flow'] += allocated_bw
-                        graph[u][v]['demandsID'].append(seq)
+                with PROFILER.phase('reserve'):
+                    for path, eids, allocated_bw in paths:
+                        state.reserve(eids, allocated_bw, seq)
                 
                 retry_accepted.append((seq, source, target, reduced_bw, len(paths), hops))
                 break  # Thành công thì dừng
     
+    # Splitter gắn vào state như observer: gỡ ra để các reserve sau không cập nhật bản residual của nó
+    if splitter is not None:
+        state.detach(splitter)
+    
     accepted.extend(retry_accepted)
     final_rejected = [d for d in rejected_first if d[0] not in [a[0] for a in retry_accepted]]
     
@@ -215,12 +202,7 @@ def process_demands_strategic(demands, graph):
     print(f"Bandwidth accepted: {total_accepted:.1f}/{total_demand:.1f} Mbps ({total_accepted/total_demand*100:.1f}%)")
     
     # Tính high utilization links
-    high_util = []
-    for u, v, data in graph.edges(data=True):
-        if data['capacity'] > 0:
-            util = data['flow'] / data['capacity']
-            if util > 0.7:
-                high_util.append((u, v, util))
+    high_util = stats.hot_links()
     
     print(f"Links >70% utilization: {len(high_util)}")
     
@@ -230,7 +212,7 @@ def process_demands_strategic(demands, graph):
     
     return accepted, final_rejected, high_util, total_accepted
 
-# 5. Chương trình chính
+# 4. Chương trình chính
 def main():
     print("="*70)
     print("TỐI ƯU ĐỂ ĐẠT Nmax = 200/200 (TUÂN THỦ CAPACITY THEO KHOẢNG CÁCH)")
@@ -238,53 +220,47 @@ def main():
     
     # Đọc đồ thị
     print("\n1. Đang đọc đồ thị AttMpls.gml...")
+    state = None
+    path_index = None
     try:
-        G = nx.read_gml(r'D:/InformationNetwork/AttMpls.gml', label='id')
+        with PROFILER.phase('load_topology'):
+            state = load_topology(r'D:/InformationNetwork/AttMpls.gml')
+            path_index = load_path_index(state, r'D:/InformationNetwork/AttMpls.gml')
+        G = state.to_graph()
         print(f"   → {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
     except Exception as e:
         print(f"Lỗi đọc file: {e}")
-        print("Tạo đồ thị mẫu để test...")
-        G = nx.erdos_renyi_graph(50, 0.15)
-        for node in G.nodes():
-            G.nodes[node]['Latitude'] = -90 + 180 * node/50
-            G.nodes[node]['Longitude'] = -180 + 360 * node/50
+        print("Tạo đồ thị mẫu (kiểu Topology Zoo, tọa độ Hoa Kỳ) để test...")
+        from synthetic import zoo_like
+        state = zoo_like(50)
+        G = state.to_graph()
     
     # Khởi tạo capacity THEO KHOẢNG CÁCH
-    G = init_graph_with_distance_capacity(G)
+    state = init_graph_with_distance_capacity(G, state)
+    stats = state.attach(LinkStats(state))
     
     # Đọc demands
     print("\n2. Đang đọc demands...")
     demands = []
     try:
-        with open('D:/InformationNetwork/AttDemand.csv', 'r') as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if not row or row[0].startswith('#'):
-                    continue
-                seq = int(row[0])
-                source = int(row[1])
-                target = int(row[2])
-                bandwidth = float(row[3])
-                demands.append((seq, source, target, bandwidth))
+        demands = load_demands(r'D:/InformationNetwork/AttDemand.csv')
         
         print(f"   → Đã đọc {len(demands)} demands")
         total_demand_bw = sum(bw for _, _, _, bw in demands)
         print(f"   → Tổng bandwidth demand: {total_demand_bw:.1f} Mbps")
     except Exception as e:
         print(f"Lỗi đọc demands: {e}")
-        print("Tạo demands mẫu...")
-        nodes = list(G.nodes())
-        for i in range(200):
-            seq = i + 1
-            source = nodes[i % len(nodes)]
-            target = nodes[(i + 5) % len(nodes)]
-            bandwidth = 10 + (i % 5) * 5  # 10-30 Mbps
-            demands.append((seq, source, target, bandwidth))
+        print("Tạo demands mẫu (mô hình gravity)...")
+        from synthetic import gravity_demands
+        demands = gravity_demands(state, 200).tolist()
     
     # Xử lý demands với chiến lược thông minh
     print("\n3. Đang xử lý demands...")
-    accepted, rejected, high_util, total_bw = process_demands_strategic(demands, G)
+    with PROFILER.phase('admission'):
+        accepted, rejected, high_util, total_bw = process_demands_strategic(demands, state, path_index, stats)
+    if path_index is not None:
+        path_index.save()
+    state.write_back(G)
     
     # KẾT QUẢ
     print("\n" + "="*70)
@@ -295,30 +271,13 @@ def main():
     print(f"Demands bị reject: {len(rejected)}")
     print(f"Links >70% utilization: {len(high_util)}")
     
-    # Tính average utilization
-    total_util = 0
-    count = 0
-    util_dist = {'0-30%': 0, '30-70%': 0, '70-100%': 0}
-    
-    for u, v, data in G.edges(data=True):
-        if data['capacity'] > 0:
-            util = data['flow'] / data['capacity']
-            total_util += util
-            count += 1
-            
-            util_pct = util * 100
-            if util_pct <= 30:
-                util_dist['0-30%'] += 1
-            elif util_pct <= 70:
-                util_dist['30-70%'] += 1
-            else:
-                util_dist['70-100%'] += 1
-    
-    avg_util = (total_util / count * 100) if count > 0 else 0
+    # Average utilization và phân bố lấy từ thống kê tăng dần
+    util_dist = stats.distribution()
+    avg_util = stats.average() * 100
     print(f"Average utilization: {avg_util:.1f}%")
     
     # Hiệu suất sử dụng mạng
-    total_capacity = sum(data['capacity'] for _, _, data in G.edges(data=True))
+    total_capacity = state.capacity.sum()
     efficiency = (total_bw / total_capacity * 100) if total_capacity > 0 else 0
     print(f"Tổng network capacity: {total_capacity:.0f} Mbps")
     print(f"Hiệu suất sử dụng capacity: {efficiency:.1f}%")
@@ -328,73 +287,17 @@ def main():
         perc = cnt / G.number_of_edges() * 100
         print(f"  {range_name}: {cnt} links ({perc:.1f}%)")
     
-    # VẼ BIỂU ĐỒ
-    plt.figure(figsize=(14, 6))
-    
-    # Biểu đồ 1: Network visualization
-    plt.subplot(1, 2, 1)
-    try:
-        pos = {node: (G.nodes[node]['Longitude'], G.nodes[node]['Latitude']) for node in G.nodes()}
-    except:
-        pos = nx.spring_layout(G)
-    
-    edge_colors = []
-    edge_widths = []
-    
-    for u, v, data in G.edges(data=True):
-        util = data['flow'] / data['capacity'] if data['capacity'] > 0 else 0
-        # Màu theo capacity
-        if data['capacity'] == 100:
-            base_color = (0.2, 0.4, 0.8)  # Xanh dương nhạt
-        elif data['capacity'] == 200:
-            base_color = (0.4, 0.6, 0.2)  # Xanh lá
-        else:  # 300
-            base_color = (0.8, 0.5, 0.2)  # Cam
-        
-        # Làm tối màu theo utilization
-        darken = 1 - util * 0.5
-        edge_color = (base_color[0] * darken, base_color[1] * darken, base_color[2] * darken)
-        edge_colors.append(edge_color)
-        edge_widths.append(1 + util * 4)
-    
-    nx.draw_networkx_nodes(G, pos, node_size=80, node_color='lightgray', alpha=0.9)
-    nx.draw_networkx_edges(G, pos, edge_color=edge_colors, width=edge_widths, alpha=0.7)
-    
-    # Thêm legend đơn giản
-    import matplotlib.patches as mpatches
-    legend_patches = [
-        mpatches.Patch(color=(0.2,0.4,0.8), label='100 Mbps'),
-        mpatches.Patch(color=(0.4,0.6,0.2), label='200 Mbps'),
-        mpatches.Patch(color=(0.8,0.5,0.2), label='300 Mbps'),
-    ]
-    plt.legend(handles=legend_patches, loc='upper right', fontsize=8)
-    
-    plt.title(f"Network với Smart Multi-path Routing\nAccepted: {len(accepted)}/{len(demands)} demands\nAvg util: {avg_util:.1f}%", fontsize=10)
-    plt.axis('off')
-    
-    # Biểu đồ 2: Utilization distribution
-    plt.subplot(1, 2, 2)
-    ranges = list(util_dist.keys())
-    counts = list(util_dist.values())
-    colors = ['green', 'orange', 'red']
-    
-    plt.bar(ranges, counts, color=colors, alpha=0.8)
-    plt.title('Phân bố Utilization của Links', fontsize=12)
-    plt.ylabel('Số links')
-    plt.xlabel('Mức độ utilization')
-    
-    # Thêm giá trị trên cột
-    for i, (range_name, count) in enumerate(util_dist.items()):
-        plt.text(i, count + 0.5, str(count), ha='center', va='bottom')
-    
-    plt.tight_layout()
-    plt.show()
+    # VẼ BIỂU ĐỒ (mạng theo capacity/utilization + phân bố utilization; headless thì ghi ra Nmax.png)
+    with PROFILER.phase('plot'):
+        fig = nmax_figure(snapshot(state), util_dist,
+                          f"Network với Smart Multi-path Routing\nAccepted: {len(accepted)}/{len(demands)} demands\nAvg util: {avg_util:.1f}%")
+        finish(fig, 'Nmax')
     
     # LƯU KẾT QUẢ
     print("\n" + "="*70)
     print("LƯU KẾT QUẢ VÀO FILE...")
     
-    with open('Nmax_200_result.txt', 'w', encoding='utf-8') as f:
+    with PROFILER.phase('report'), open('Nmax_200_result.txt', 'w', encoding='utf-8') as f:
         f.write("KẾT QUẢ TỐI ƯU ĐẠT Nmax = 200/200\n")
         f.write("="*60 + "\n")
         f.write(f"Phương pháp: Smart Multi-path Routing với Strategic Ordering\n")
@@ -424,7 +327,10 @@ def main():
         
         
     
-    print("Kết quả đã lưu vào: Nmax_200_result.txt")
+    with PROFILER.phase('write_results'):
+        results_path = write_results('Nmax_200_result', state, demands,
+                                     metadata={'method': 'Smart Multi-path Routing'})
+    print(f"Kết quả đã lưu vào: Nmax_200_result.txt, {results_path}")
     
     # KẾT LUẬN
     print("\n" + "="*70)
@@ -0,0 +1,453 @@
+import heapq
+import math
+import numpy as np
+from collections import defaultdict
+from itertools import count
+from instrumentation import PROFILER
+
+
+# 1. Chỉ mục link theo residual capacity
+class ResidualIndex:
+    """Nhóm các edge id theo residual (mỗi bucket rộng bucket_size Mbps), cập nhật tăng dần"""
+
+    def __init__(self, state, bucket_size=1.0):
+        self.bucket_size = bucket_size
+        self.buckets = defaultdict(set)
+        self.residual = {}
+        for e, residual in enumerate(state.residual.tolist()):
+            self.update(e, residual)
+
+    def _bucket(self, residual):
+        return int(math.floor(residual / self.bucket_size))
+
+    def update(self, edge, residual):
+        old = self.residual.get(edge)
+        self.residual[edge] = residual
+        if old is not None:
+            old_bucket = self._bucket(old)
+            if old_bucket == self._bucket(residual):
+                return
+            members = self.buckets[old_bucket]
+            members.discard(edge)
+            if not members:
+                del self.buckets[old_bucket]
+        self.buckets[self._bucket(residual)].add(edge)
+
+    def max_residual(self):
+        if not self.buckets:
+            return 0.0
+        return max(self.residual[e] for e in self.buckets[max(self.buckets)])
+
+
+# 2. Dijkstra trên CSR, bỏ qua link thiếu residual
+def residual_shortest_path(state, source, target, bandwidth, cost=None, weight=None):
+    """Đường đi ngắn nhất (theo chỉ số node) chỉ qua các link có residual >= bandwidth.
+
+    cost: hàm cost(e) thay cho distance, trả về None để bỏ qua link.
+    weight: list trọng số theo edge id thay cho distance (không gọi hàm cho mỗi link).
+    Trả về (danh sách node, danh sách edge id) hoặc None nếu không có đường.
+    """
+    indptr, indices, edge_ids, distance = state.adjacency()
+    if weight is not None:
+        distance = weight
+    residual = state.residual
+    dist = {source: 0.0}
+    prev = {source: None}
+    done = set()
+    tie = count()
+    heap = [(0.0, next(tie), source)]
+
+    while heap:
+        d, _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        if u == target:
+            nodes, eids = [u], []
+            while prev[nodes[-1]] is not None:
+                p, e = prev[nodes[-1]]
+                nodes.append(p)
+                eids.append(e)
+            if PROFILER.enabled:
+                PROFILER.search('dijkstra', indptr, done)
+            return nodes[::-1], eids[::-1]
+        done.add(u)
+
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if v in done:
+                continue
+            e = edge_ids[k]
+            if cost is None:
+                if residual[e] < bandwidth:
+                    continue
+                w = distance[e]
+            else:
+                w = cost(e)
+                if w is None:
+                    continue
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                prev[v] = (u, e)
+                heapq.heappush(heap, (nd, next(tie), v))
+
+    if PROFILER.enabled:
+        PROFILER.search('dijkstra', indptr, done)
+    return None
+
+
+# 3. Định tuyến theo tải: hàm cost theo tên, mảng trọng số cập nhật tăng dần
+def linear_cost(distance, flow, capacity):
+    """distance * (1 + utilization), như trọng số động trong test2.py"""
+    return distance * (1 + flow / capacity)
+
+
+def mm1_cost(distance, flow, capacity):
+    """Độ trễ kiểu M/M/1: distance / (1 - utilization), vô cùng khi link đầy"""
+    util = flow / capacity
+    with np.errstate(divide='ignore'):
+        return np.where(util < 1, distance / np.maximum(1 - util, 0), np.inf)
+
+
+# Hàm Fortz-Thorup: các đoạn tuyến tính (utilization bắt đầu, hệ số góc)
+PIECEWISE_SEGMENTS = ((0.0, 1), (1 / 3, 3), (2 / 3, 10), (0.9, 70), (1.0, 500), (1.1, 5000))
+# Giá trị phi tại các điểm gãy (thêm một điểm rất xa cho đoạn cuối) để tra bằng np.interp
+_PIECEWISE_X = np.array([start for start, _ in PIECEWISE_SEGMENTS] + [1e3])
+_PIECEWISE_Y = np.concatenate([[0.0], np.cumsum(np.diff(_PIECEWISE_X) * [slope for _, slope in PIECEWISE_SEGMENTS])])
+
+
+def piecewise_cost(distance, flow, capacity):
+    """distance * (1 + phi(utilization)), phi tuyến tính từng đoạn, lồi (Fortz-Thorup)"""
+    return distance * (1 + np.interp(flow / capacity, _PIECEWISE_X, _PIECEWISE_Y))
+
+
+# Mọi hàm cost đều >= distance, điều kiện để dùng cận của chỉ mục đường ứng viên
+LINK_COSTS = {'linear': linear_cost, 'mm1': mm1_cost, 'piecewise': piecewise_cost}
+
+
+class LoadAwareRouter:
+    """Dijkstra với trọng số link = cost(distance, flow, capacity) chọn theo tên.
+
+    Gắn vào NetworkState như một observer: mỗi reserve/release chỉ tính lại trọng số
+    của các link trên path, nên vòng Dijkstra đọc thẳng từ list trọng số, không gọi hàm Python.
+    """
+
+    def __init__(self, state, cost='linear', path_index=None):
+        if cost not in LINK_COSTS:
+            raise ValueError(f"Không có hàm cost '{cost}', chọn một trong {tuple(LINK_COSTS)}")
+        self.state = state
+        self.cost = LINK_COSTS[cost]
+        self.path_index = path_index
+        self.refresh()
+        state.attach(self)
+
+    def refresh(self):
+        state = self.state
+        # Link hỏng (capacity 0) có trọng số nan/inf nhưng không bao giờ được chọn vì residual = 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.weights = self.cost(state.distance, state.flow, state.capacity)
+        self.weight = self.weights.tolist()
+
+    def update(self, eids):
+        state = self.state
+        eids = np.asarray(eids, dtype=np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = self.cost(state.distance[eids], state.flow[eids], state.capacity[eids])
+        self.weights[eids] = values
+        for e, w in zip(eids.tolist(), values.tolist()):
+            self.weight[e] = w
+
+    def route(self, source, target, bandwidth):
+        """Đường có tổng trọng số nhỏ nhất qua các link còn đủ bandwidth (theo chỉ số node).
+
+        Trả về (danh sách node, danh sách edge id) hoặc None.
+        """
+        state = self.state
+        if self.path_index is not None:
+            # Tra chỉ mục: ứng viên đủ residual có trọng số nhỏ nhất. Trọng số >= distance,
+            # nên nếu không vượt distance của ứng viên dài nhất thì không đường nào ngoài chỉ mục tốt hơn
+            candidates = self.path_index.candidates(source, target)
+            best, best_cost = None, math.inf
+            for cand in candidates:
+                if (state.residual[cand] < bandwidth).any():
+                    continue
+                cost = self.weights[cand].sum()
+                if cost < best_cost:
+                    best, best_cost = cand, cost
+            bound = state.distance[candidates[-1]].sum() if len(candidates) == self.path_index.k else math.inf
+            if best is not None and best_cost <= bound:
+                eids = best.tolist()
+                return state.path_nodes(source, eids), eids
+
+        return residual_shortest_path(state, source, target, bandwidth, weight=self.weight)
+
+
+# 4. Cây đường đi ngắn nhất theo nguồn, dùng chung cho các demand cùng source và mức bandwidth
+def shortest_path_tree(state, source, bandwidth):
+    """Dijkstra toàn bộ từ source qua các link có residual >= bandwidth.
+
+    Trả về list prev: prev[v] = (node cha, edge id), None với source hoặc node không tới được.
+    """
+    indptr, indices, edge_ids, distance = state.adjacency()
+    residual = state.residual
+    dist = {source: 0.0}
+    prev = [None] * state.num_nodes
+    done = set()
+    tie = count()
+    heap = [(0.0, next(tie), source)]
+
+    while heap:
+        d, _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if v in done:
+                continue
+            e = edge_ids[k]
+            if residual[e] < bandwidth:
+                continue
+            nd = d + distance[e]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                prev[v] = (u, e)
+                heapq.heappush(heap, (nd, next(tie), v))
+    if PROFILER.enabled:
+        PROFILER.search('spt', indptr, done)
+    return prev
+
+
+class ShortestPathTrees:
+    """Cache một cây đường đi ngắn nhất cho mỗi source, trên các link còn residual > 0.
+
+    Đồ thị theo bandwidth bất kỳ là con của đồ thị residual > 0, nên đường trên cây tới target là
+    đường ngắn nhất chính xác nếu mọi link của nó còn residual >= bandwidth; mọi demand cùng source
+    dùng chung một cây, không phụ thuộc mức bandwidth. Nếu đường trên cây thiếu bandwidth, chỉ demand
+    đó chạy Dijkstra từng cặp, cây vẫn được giữ. Cây chỉ bị dựng lại khi một link của nó hết residual
+    (rời khỏi đồ thị); khi link được trả residual (release), mọi cây bị xóa.
+    """
+
+    # Ngưỡng dựng cây: link có residual nhỏ hơn coi như đã đầy
+    MIN_RESIDUAL = 1e-9
+
+    def __init__(self, state):
+        self.state = state
+        self.builds = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.refresh()
+        state.attach(self)
+
+    def refresh(self):
+        self.trees = {}
+        self.edge_trees = defaultdict(set)
+        self.residual = self.state.residual.tolist()
+
+    def _build(self, source):
+        prev = shortest_path_tree(self.state, source, self.MIN_RESIDUAL)
+        self.builds += 1
+        self.trees[source] = prev
+        for parent in prev:
+            if parent is not None:
+                self.edge_trees[parent[1]].add(source)
+        return prev
+
+    def _drop(self, source):
+        for parent in self.trees.pop(source):
+            if parent is not None:
+                self.edge_trees[parent[1]].discard(source)
+
+    def update(self, eids):
+        residual = self.state.residual
+        for e in (eids.tolist() if isinstance(eids, np.ndarray) else eids):
+            new, old = float(residual[e]), self.residual[e]
+            self.residual[e] = new
+            if new > old:
+                self.refresh()
+                return
+            if new < self.MIN_RESIDUAL:
+                for source in list(self.edge_trees.get(e, ())):
+                    self._drop(source)
+
+    def _walk(self, prev, source, target, bandwidth):
+        """Đường trên cây từ source tới target nếu mọi link còn residual >= bandwidth"""
+        residual = self.residual
+        nodes, eids = [target], []
+        while nodes[-1] != source:
+            parent = prev[nodes[-1]]
+            if parent is None or residual[parent[1]] < bandwidth:
+                return None
+            nodes.append(parent[0])
+            eids.append(parent[1])
+        return nodes[::-1], eids[::-1]
+
+    def route(self, source, target, bandwidth):
+        """(danh sách node, danh sách edge id) hoặc None, theo chỉ số node"""
+        prev = self.trees.get(source)
+        if prev is None:
+            prev = self._build(source)
+        found = self._walk(prev, source, target, bandwidth)
+        if found is not None:
+            self.hits += 1
+            return found
+        if prev[target] is None and target != source:
+            # Không tới được ngay cả trên đồ thị residual > 0
+            return None
+        self.fallbacks += 1
+        return residual_shortest_path(self.state, source, target, bandwidth)
+
+
+# 5. Engine admission dùng chung cho các phương pháp
+class AdmissionEngine:
+    """Định tuyến và cấp phát bandwidth trực tiếp trên NetworkState, không copy.
+
+    path_index: PathIndex tùy chọn; cặp node đã có trong chỉ mục chỉ cần tra cứu
+    và kiểm tra residual, Dijkstra chỉ chạy khi mọi đường ứng viên đều thiếu residual.
+    trees: ShortestPathTrees tùy chọn, thay Dijkstra từng cặp bằng cây dùng chung theo source.
+    Nếu flow/capacity có thể đổi ngoài engine (teardown trực tiếp trên state, link hỏng), người gọi
+    gắn engine vào state như observer (state.attach) để ResidualIndex luôn đúng, và detach khi xong.
+    """
+
+    def __init__(self, state, path_index=None, trees=None):
+        self.state = state
+        self.path_index = path_index
+        self.trees = trees
+        self.index = ResidualIndex(state)
+
+    def refresh(self):
+        self.index = ResidualIndex(self.state)
+
+    def update(self, eids):
+        residual = self.state.residual
+        for e in (eids.tolist() if isinstance(eids, np.ndarray) else eids):
+            self.index.update(e, float(residual[e]))
+
+    def route(self, source, target, bandwidth):
+        """Trả về (path theo node label, edge ids) hoặc None"""
+        if bandwidth > self.index.max_residual():
+            return None
+        state = self.state
+        s, t = state.node_index[source], state.node_index[target]
+        if self.path_index is not None:
+            eids = self.path_index.first_fit(s, t, bandwidth)
+            if eids is not None:
+                if PROFILER.enabled:
+                    PROFILER.count('route_index_hit')
+                return [state.nodes[i] for i in state.path_nodes(s, eids)], eids.tolist()
+        if self.trees is not None:
+            found = self.trees.route(s, t, bandwidth)
+        else:
+            found = residual_shortest_path(state, s, t, bandwidth)
+        if found is None:
+            return None
+        nodes, eids = found
+        return [state.nodes[i] for i in nodes], eids
+
+    def reserve(self, eids, bandwidth, seq):
+        self.state.reserve(eids, bandwidth, seq)
+        for e in eids:
+            self.index.update(e, float(self.state.residual[e]))
+
+    def release(self, eids, bandwidth, seq):
+        self.state.release(eids, bandwidth, seq)
+        for e in eids:
+            self.index.update(e, float(self.state.residual[e]))
+
+    def teardown(self, seq):
+        """Giải phóng demand seq theo bản ghi reserve của nó, O(độ dài path)"""
+        records = self.state.reservations.get(seq)
+        if not records:
+            return False
+        self.state.teardown(seq)
+        for eids, _ in records:
+            for e in eids:
+                self.index.update(e, float(self.state.residual[e]))
+        return True
+
+    def admit(self, seq, source, target, bandwidth):
+        """Trả về path nếu demand được chấp nhận, None nếu bị từ chối"""
+        with PROFILER.phase('route'):
+            found = self.route(source, target, bandwidth)
+        if found is None:
+            return None
+        path, eids = found
+        with PROFILER.phase('reserve'):
+            self.reserve(eids, bandwidth, seq)
+        return path
+
+
+# 6. Đường rộng nhất: Dijkstra cực đại hóa bottleneck residual thay vì tổng distance
+def widest_path(state, source, target, minimum=0.0, residual=None, weight=None):
+    """Đường có bottleneck residual lớn nhất từ source tới target (theo chỉ số node).
+
+    Chỉ đi qua link có residual > minimum; giữa các đường cùng bottleneck ưu tiên đường có
+    tổng distance (hoặc weight) nhỏ hơn. residual: mảng thay cho state.residual (ví dụ bản nháp
+    đã trừ phần cấp phát tạm). Trả về (bottleneck, danh sách node, danh sách edge id) hoặc None.
+    """
+    indptr, indices, edge_ids, distance = state.adjacency()
+    if weight is not None:
+        distance = weight
+    residual = state.residual if residual is None else residual
+    best = {source: (math.inf, 0.0)}
+    prev = {source: None}
+    done = set()
+    tie = count()
+    heap = [(-math.inf, 0.0, next(tie), source)]
+
+    while heap:
+        neg_width, d, _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        if u == target:
+            nodes, eids = [u], []
+            while prev[nodes[-1]] is not None:
+                p, e = prev[nodes[-1]]
+                nodes.append(p)
+                eids.append(e)
+            if PROFILER.enabled:
+                PROFILER.search('widest', indptr, done)
+            return float(-neg_width), nodes[::-1], eids[::-1]
+        done.add(u)
+
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if v in done:
+                continue
+            e = edge_ids[k]
+            r = residual[e]
+            if r <= minimum:
+                continue
+            width = min(-neg_width, r)
+            nd = d + distance[e]
+            old = best.get(v)
+            if old is None or width > old[0] or (width == old[0] and nd < old[1]):
+                best[v] = (width, nd)
+                prev[v] = (u, e)
+                heapq.heappush(heap, (-width, nd, next(tie), v))
+
+    if PROFILER.enabled:
+        PROFILER.search('widest', indptr, done)
+    return None
+
+
+def widest_paths(state, source, target, bandwidth, max_paths=3, minimum=0.0):
+    """Chia bandwidth trên tối đa max_paths đường rộng nhất liên tiếp.
+
+    Mỗi đường được tìm trên residual đã trừ phần cấp phát của các đường trước (bản nháp,
+    state không đổi), nên các đường dùng chung link không cấp phát vượt capacity.
+    Trả về (list (nodes, eids, bandwidth cấp phát), phần bandwidth chưa cấp phát được).
+    """
+    residual = state.residual.copy()
+    paths = []
+    remaining = bandwidth
+    while remaining > 1e-9 and len(paths) < max_paths:
+        found = widest_path(state, source, target, minimum, residual)
+        if found is None:
+            break
+        width, nodes, eids = found
+        allocate = min(remaining, width)
+        residual[eids] -= allocate
+        paths.append((nodes, eids, allocate))
+        remaining -= allocate
+    return paths, remaining
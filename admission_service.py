@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+import numpy as np
+
+from admission import AdmissionEngine
+from demand_stream import iter_demand_batches, iter_demands
+from link_stats import LinkStats
+from path_index import load_path_index
+from topology_cache import load_topology
+
+DEFAULT_PORT = 8765
+
+
+# 1. Dịch vụ admission: giữ NetworkState trong bộ nhớ, xử lý FCFS theo micro-batch
+class AdmissionService:
+    """Giao thức: mỗi dòng một JSON, trả lời một dòng JSON cùng 'id'.
+
+    {"op": "admit", "seq", "source", "target", "bandwidth"} -> {"accepted": bool, "path": [...]}
+    {"op": "release", "seq"}                               -> {"released": bool}
+    {"op": "stats"}                                        -> số demand đang giữ, utilization
+    """
+
+    def __init__(self, state, path_index=None, max_batch=256, max_delay=0.001):
+        self.state = state
+        self.path_index = path_index
+        self.engine = AdmissionEngine(state, path_index)
+        self.stats = state.attach(LinkStats(state))
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = None
+        self.batches = 0
+        self.handled = 0
+
+    def handle(self, request):
+        """Xử lý đồng bộ một request (gọi tuần tự trong batcher nên giữ đúng thứ tự FCFS)"""
+        op = request.get('op', 'admit')
+        if op == 'admit':
+            missing = [key for key in ('seq', 'source', 'target', 'bandwidth') if key not in request]
+            if missing:
+                return {'error': f"thiếu trường: {', '.join(missing)}"}
+            seq = request['seq']
+            if seq in self.state.reservations:
+                return {'accepted': False, 'reason': "seq đang được giữ"}
+            source, target = request['source'], request['target']
+            try:
+                bandwidth = float(request['bandwidth'])
+            except (TypeError, ValueError):
+                bandwidth = math.nan
+            # NaN / âm / vô hạn lọt qua mọi phép so sánh residual và làm hỏng state vĩnh viễn
+            if not math.isfinite(bandwidth) or bandwidth <= 0:
+                return {'accepted': False, 'reason': "bandwidth phải là số dương hữu hạn"}
+            if source not in self.state.node_index or target not in self.state.node_index:
+                return {'accepted': False, 'reason': "Node không tồn tại"}
+            found = self.engine.route(source, target, bandwidth)
+            if found is None:
+                return {'accepted': False, 'reason': "Không tìm thấy đường đi đủ bandwidth"}
+            path, eids = found
+            self.engine.reserve(eids, bandwidth, seq)
+            return {'accepted': True, 'path': path}
+        if op == 'release':
+            return {'released': self.engine.teardown(request['seq'])}
+        if op == 'stats':
+            stats = self.stats
+            return {'active': len(self.state.reservations), 'avg_util': stats.average(),
+                    'p50_util': stats.percentile(50), 'p95_util': stats.percentile(95),
+                    'max_util': float(self.state.utilization().max(initial=0.0)), 'distribution': stats.distribution(),
+                    'hot_links': [[u, v, util] for u, v, util in stats.hot_links()],
+                    'batches': self.batches, 'handled': self.handled}
+        return {'error': f"op không hợp lệ: {op}"}
+
+    async def _batcher(self):
+        # Gom các request đến gần nhau thành một batch, xử lý liền một mạch rồi trả kết quả
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            for request, future in batch:
+                try:
+                    reply = self.handle(request)
+                except Exception as exc:
+                    # Một request lỗi không được làm dừng batcher (mọi kết nối đang chờ nó)
+                    reply = {'error': f"request không hợp lệ: {exc!r}"}
+                if not future.cancelled():
+                    future.set_result(reply)
+            self.batches += 1
+            self.handled += len(batch)
+
+    async def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def _serve_client(self, reader, writer):
+        lock = asyncio.Lock()
+
+        async def answer(request):
+            reply = await self.submit(request)
+            if 'id' in request:
+                reply['id'] = request['id']
+            async with lock:
+                writer.write((json.dumps(reply) + '\n').encode())
+                await writer.drain()
+
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    writer.write((json.dumps({'error': f"JSON không hợp lệ: {exc}"}) + '\n').encode())
+                    continue
+                if not isinstance(request, dict):
+                    writer.write((json.dumps({'error': "request phải là một JSON object"}) + '\n').encode())
+                    continue
+                # Mỗi request là một task để client có thể pipeline nhiều request trên một kết nối
+                task = asyncio.ensure_future(answer(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.queue = asyncio.Queue()
+        batcher = asyncio.ensure_future(self._batcher())
+        server = await asyncio.start_server(self._serve_client, host, port)
+        print(f"Admission service đang chạy tại {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if self.path_index is not None:
+                self.path_index.save()
+
+
+# 2. Client phát lại demands từ file với tốc độ cho trước, đo độ trễ
+async def replay(path, host='127.0.0.1', port=DEFAULT_PORT, rate=1000.0, hold=None):
+    """Gửi admit cho từng demand (rate request/giây, 0 = nhanh nhất có thể).
+
+    hold: nếu có, release mỗi demand được chấp nhận sau hold giây.
+    Trả về dict: sent, accepted, latencies (giây, theo thứ tự gửi), seconds.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    waiting = {}
+    loop = asyncio.get_running_loop()
+
+    async def read_replies():
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = waiting.pop(reply.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+
+    async def call(request_id, request):
+        future = loop.create_future()
+        waiting[request_id] = future
+        request['id'] = request_id
+        writer.write((json.dumps(request) + '\n').encode())
+        return await future
+
+    async def one(request_id, seq, source, target, bandwidth):
+        sent = time.perf_counter()
+        reply = await call(request_id, {'op': 'admit', 'seq': seq, 'source': source,
+                                        'target': target, 'bandwidth': bandwidth})
+        latency = time.perf_counter() - sent
+        if reply.get('accepted') and hold is not None:
+            await asyncio.sleep(hold)
+            await call(-request_id - 1, {'op': 'release', 'seq': seq})
+        return latency, bool(reply.get('accepted'))
+
+    receiver = asyncio.ensure_future(read_replies())
+    start = time.perf_counter()
+    tasks = []
+    for i, (seq, source, target, bandwidth) in enumerate(iter_demands(iter_demand_batches(path))):
+        if rate > 0:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(i, seq, source, target, bandwidth)))
+        await writer.drain()
+    results = await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - start
+
+    receiver.cancel()
+    writer.close()
+    return {'sent': len(results), 'accepted': sum(ok for _, ok in results),
+            'latencies': [latency for latency, _ in results], 'seconds': seconds}
+
+
+def latency_report(result):
+    latencies = np.asarray(result['latencies']) * 1000
+    lines = [f"Đã gửi {result['sent']} demands, chấp nhận {result['accepted']} "
+             f"trong {result['seconds']:.2f}s ({result['sent'] / max(result['seconds'], 1e-9):.0f} req/s)"]
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        lines.append(f"Độ trễ (ms): p50 = {p50:.3f}, p95 = {p95:.3f}, p99 = {p99:.3f}, max = {latencies.max():.3f}")
+    return "\n".join(lines)
+
+
+# 3. Chạy từ dòng lệnh: serve <topology> hoặc replay <demands>
+def main():
+    parser = argparse.ArgumentParser(description="Dịch vụ admission FCFS trực tuyến (asyncio, JSON theo dòng)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_cmd = commands.add_parser('serve', help="Chạy dịch vụ")
+    serve_cmd.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    serve_cmd.add_argument('--max-batch', type=int, default=256)
+    serve_cmd.add_argument('--max-delay', type=float, default=0.001, help="Thời gian gom batch tối đa (giây)")
+
+    replay_cmd = commands.add_parser('replay', help="Phát lại demands từ file CSV/JSONL")
+    replay_cmd.add_argument('demands', help="File demands CSV hoặc JSONL")
+    replay_cmd.add_argument('--rate', type=float, default=1000.0, help="Số request/giây (0 = không giới hạn)")
+    replay_cmd.add_argument('--hold', type=float, default=None, help="Release demand sau N giây")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        state = load_topology(args.topology)
+        service = AdmissionService(state, load_path_index(state, args.topology), args.max_batch, args.max_delay)
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        result = asyncio.run(replay(args.demands, args.host, args.port, args.rate, args.hold))
+        print(latency_report(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from instrumentation import PROFILER
+from path_index import PathIndex
+from spanning_tree import prim_mst
+from strategy_runner import demand_hops, make_policy, order_demands
+from synthetic import DEMAND_MODELS, TOPOLOGIES
+
+# Phương pháp -> (policy, ordering) của strategy_runner, giống FCFS.py, test2.py, Nmax.py
+METHODS = {'fcfs': ('shortest', 'arrival'), 'sbf': ('load_aware', 'bandwidth'),
+           'nmax': ('multipath', 'bandwidth_hops'), 'nmax_widest': ('widest_split', 'bandwidth_hops'),
+           'nmax_maxflow': ('maxflow_split', 'bandwidth_hops'), 'mst': (None, None)}
+# Sai số cho phép khi so với baseline (throughput giảm quá 20% bị coi là chậm đi)
+TOLERANCE = 0.2
+
+
+# 1. Bộ nhớ đỉnh của process (MB); None nếu nền tảng không hỗ trợ
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def timed(phases, name, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    phases[name] = time.perf_counter() - start
+    return result
+
+
+# 2. Một lần đo: sinh topology + demands rồi chạy một phương pháp (gọi trong process riêng)
+def run_case(case):
+    """case: dict topology, nodes, demand_model, demands, method, k, seed, profile.
+
+    k: số đường ứng viên của PathIndex như trong các script (0 = không dùng chỉ mục, chỉ Dijkstra).
+
+    Trả về một bản ghi: accepted, thời gian end-to-end và theo phase, throughput (demands/s), bộ nhớ đỉnh.
+    """
+    phases = {}
+    if case['method'].startswith('nmax'):
+        import Nmax  # noqa: F401  nạp trước (kéo theo matplotlib) để không tính vào thời gian setup
+    baseline_rss = peak_rss_mb()
+    state = timed(phases, 'generate_topology', TOPOLOGIES[case['topology']], case['nodes'], seed=case['seed'])
+    record = dict(case, edges=state.num_edges)
+    policy, ordering = METHODS[case['method']]
+
+    start = time.perf_counter()
+    if policy is None:
+        eids, total = timed(phases, 'mst', prim_mst, state)
+        record.update(tree_edges=len(eids), total_distance=total, demands=0, accepted=None, accepted_bw=None)
+    else:
+        demands = timed(phases, 'generate_demands', DEMAND_MODELS[case['demand_model']],
+                        state, case['demands'], case['seed'])
+        start = time.perf_counter()
+        hops = timed(phases, 'hops', demand_hops, state, demands) if ordering == 'bandwidth_hops' else None
+        order = timed(phases, 'order', order_demands, demands, hops, ordering).tolist()
+        admit = timed(phases, 'setup', make_policy, policy, state, PathIndex(state, case['k']) if case['k'] else None)
+        if case['profile']:
+            PROFILER.enable()
+
+        accepted, accepted_bw = 0, 0.0
+        admit_start = time.perf_counter()
+        for i in order:
+            seq, source, target, bandwidth = demands[i].tolist()
+            with PROFILER.demand(seq):
+                ok = admit(seq, source, target, bandwidth)
+            if ok:
+                accepted += 1
+                accepted_bw += bandwidth
+        phases['admit'] = time.perf_counter() - admit_start
+        record.update(accepted=accepted, accepted_bw=accepted_bw)
+
+    record['seconds'] = time.perf_counter() - start
+    record['throughput'] = record['demands'] / record['seconds'] if record['seconds'] > 0 else None
+    record['phases'] = phases
+    record['baseline_rss_mb'] = baseline_rss
+    record['peak_rss_mb'] = peak_rss_mb()
+    if case['profile']:
+        PROFILER.disable()
+        record['profiler'] = {'phases': {name: {'count': n, 'seconds': s} for name, (n, s) in PROFILER.phases.items()},
+                             'counters': dict(PROFILER.counters),
+                             'p50_ms': PROFILER.percentile(50) * 1000, 'p99_ms': PROFILER.percentile(99) * 1000}
+    return record
+
+
+def make_cases(topologies, nodes, demand_models, demands, methods, k=8, seed=0, profile=False):
+    """Tích Descartes các tham số; MST không phụ thuộc demands nên chỉ chạy một lần mỗi topology"""
+    cases = []
+    for topology in topologies:
+        for n in nodes:
+            for method in methods:
+                if METHODS[method][0] is None:
+                    cases.append({'topology': topology, 'nodes': n, 'demand_model': None, 'demands': 0,
+                                  'method': method, 'k': 0, 'seed': seed, 'profile': False})
+                    continue
+                cases.extend({'topology': topology, 'nodes': n, 'demand_model': model, 'demands': m,
+                              'method': method, 'k': k, 'seed': seed, 'profile': profile}
+                             for model in demand_models for m in demands)
+    return cases
+
+
+def run_cases(cases, workers=1):
+    """Mỗi lần đo chạy trong một process mới (spawn) để bộ nhớ đỉnh không lẫn giữa các lần đo.
+    Mặc định chạy tuần tự để thời gian đo không bị ảnh hưởng lẫn nhau.
+    """
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as pool:
+        yield from pool.map(run_case, cases)
+
+
+# 3. Báo cáo và so sánh với lần chạy trước
+HEADER = (f"{'Topology':<10} {'Nodes':>8} {'Edges':>8} {'Demands':<16} {'Method':<11} {'Accepted':>9} "
+          f"{'Time (s)':>9} {'Demands/s':>10} {'Peak RSS':>9}")
+
+
+def format_row(r):
+    demands = f"{r['demand_model']}:{r['demands']}" if r['demand_model'] else '-'
+    accepted = '-' if r['accepted'] is None else r['accepted']
+    throughput = '-' if not r['throughput'] else f"{r['throughput']:.0f}"
+    rss = '-' if r['peak_rss_mb'] is None else f"{r['peak_rss_mb']:.0f} MB"
+    return (f"{r['topology']:<10} {r['nodes']:>8} {r['edges']:>8} {demands:<16} {r['method']:<11} {accepted:>9} "
+            f"{r['seconds']:>9.3f} {throughput:>10} {rss:>9}")
+
+
+def case_key(r):
+    return r['topology'], r['nodes'], r['demand_model'], r['demands'], r['method'], r['k'], r['seed']
+
+
+def compare(records, baseline, tolerance=TOLERANCE):
+    """Các dòng cảnh báo: chậm hơn baseline quá tolerance hoặc số demand được chấp nhận thay đổi"""
+    previous = {case_key(r): r for r in baseline}
+    warnings = []
+    for r in records:
+        old = previous.get(case_key(r))
+        if old is None:
+            continue
+        name = f"{r['topology']}/{r['nodes']}/{r['demand_model']}:{r['demands']}/{r['method']}"
+        if r['seconds'] > old['seconds'] * (1 + tolerance):
+            warnings.append(f"CHẬM HƠN {name}: {old['seconds']:.3f}s -> {r['seconds']:.3f}s")
+        if r['accepted'] != old['accepted']:
+            warnings.append(f"KẾT QUẢ KHÁC {name}: accepted {old['accepted']} -> {r['accepted']}")
+    return warnings
+
+
+# 4. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FCFS / SBF / Nmax multipath / MST trên topology tổng hợp")
+    parser.add_argument('--topologies', nargs='+', default=['waxman', 'geometric', 'zoo'], choices=list(TOPOLOGIES))
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--demand-models', nargs='+', default=['gravity', 'uniform', 'hotspot'],
+                        choices=list(DEMAND_MODELS))
+    parser.add_argument('--demands', type=int, nargs='+', default=[1000])
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--k', type=int, default=8,
+                        help="Số đường ứng viên của PathIndex (0 = chỉ Dijkstra, nên dùng khi > 10^4 node)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', action='store_true', help="Ghi thêm phase/bộ đếm của PROFILER")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--json', default=None, help="Ghi kết quả ra file JSON")
+    parser.add_argument('--baseline', default=None, help="File JSON của lần chạy trước để so sánh")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    cases = make_cases(args.topologies, args.nodes, args.demand_models, args.demands, args.methods,
+                       args.k, args.seed, args.profile)
+    print(HEADER)
+    print("-" * len(HEADER))
+    records = []
+    for record in run_cases(cases, args.workers):
+        records.append(record)
+        print(format_row(record), flush=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'records': records}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            warnings = compare(records, json.load(f)['records'], args.tolerance)
+        print("\n" + ("\n".join(warnings) if warnings else "Không có thay đổi so với baseline"))
+        if warnings:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
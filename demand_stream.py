@@ -0,0 +1,56 @@
+import csv
+import json
+import numpy as np
+
+# Kiểu bản ghi của một demand
+DEMAND_DTYPE = np.dtype([('seq', np.int64), ('source', np.int64),
+                         ('target', np.int64), ('bandwidth', np.float64)])
+
+
+# 1. Đọc từng dòng demand từ CSV (bỏ header, dòng trống và dòng comment '#')
+def _csv_rows(f):
+    reader = csv.reader(f)
+    next(reader, None)
+    for row in reader:
+        if not row or row[0].startswith('#'):
+            continue
+        yield int(row[0]), int(row[1]), int(row[2]), float(row[3])
+
+
+# 2. Đọc từng dòng demand từ JSONL (khóa seq/source/target/bandwidth, không phân biệt hoa thường)
+def _jsonl_rows(f):
+    for line_no, line in enumerate(f):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        record = {k.lower(): v for k, v in json.loads(line).items()}
+        yield (int(record.get('seq', line_no)), int(record['source']),
+               int(record['target']), float(record['bandwidth']))
+
+
+# 3. Stream demands theo batch, bộ nhớ chỉ phụ thuộc batch_size
+def iter_demand_batches(path, batch_size=65536):
+    """Sinh các mảng NumPy DEMAND_DTYPE (tối đa batch_size demands), giữ nguyên thứ tự file"""
+    is_jsonl = path.lower().endswith(('.jsonl', '.ndjson'))
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = _jsonl_rows(f) if is_jsonl else _csv_rows(f)
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= batch_size:
+                yield np.array(buffer, dtype=DEMAND_DTYPE)
+                buffer = []
+        if buffer:
+            yield np.array(buffer, dtype=DEMAND_DTYPE)
+
+
+def iter_demands(batches):
+    """Duyệt từng demand (seq, source, target, bandwidth) từ các batch"""
+    for batch in batches:
+        yield from zip(batch['seq'].tolist(), batch['source'].tolist(),
+                       batch['target'].tolist(), batch['bandwidth'].tolist())
+
+
+def load_demands(path):
+    """Đọc toàn bộ demands thành list tuple (cho các phương pháp cần sắp xếp lại)"""
+    return list(iter_demands(iter_demand_batches(path)))
@@ -0,0 +1,41 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Capacity theo khoảng cách (ĐÚNG ĐỀ BÀI): <=1000 km: 100, <=2000 km: 200, còn lại: 300 Mbps
+CAPACITY_BOUNDS = (1000, 2000)
+CAPACITY_TIERS = (100, 200, 300)
+
+
+# 1. Haversine dạng vector (nhận scalar hoặc mảng, trả về km)
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+
+# 2. Khoảng cách của tất cả các cạnh trong một lần tính
+def edge_distances(latitude, longitude, src, dst):
+    """latitude/longitude theo chỉ số node, src/dst là mảng chỉ số node của từng cạnh"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    return haversine(latitude[src], longitude[src], latitude[dst], longitude[dst])
+
+
+# 3. Ma trận khoảng cách node-node (n x n, bộ nhớ O(n^2))
+def distance_matrix(latitude, longitude, dtype=np.float64):
+    lat = np.asarray(latitude, dtype=np.float64)
+    lon = np.asarray(longitude, dtype=np.float64)
+    return haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :]).astype(dtype, copy=False)
+
+
+# 4. Gán capacity theo bậc khoảng cách (bucketing vector)
+def capacity_tiers(distance, bounds=CAPACITY_BOUNDS, tiers=CAPACITY_TIERS):
+    """Khoảng cách đúng bằng ngưỡng thuộc bậc thấp hơn (distance <= bound)"""
+    if len(tiers) != len(bounds) + 1:
+        raise ValueError("Số bậc capacity phải bằng số ngưỡng + 1")
+    tier_index = np.searchsorted(np.asarray(bounds, dtype=np.float64), distance, side='left')
+    return np.asarray(tiers, dtype=np.float64)[tier_index]
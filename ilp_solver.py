@@ -0,0 +1,250 @@
+import argparse
+import time
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from scipy.sparse import csr_matrix
+
+from admission import AdmissionEngine, residual_shortest_path
+from demand_stream import DEMAND_DTYPE, iter_demand_batches
+from path_index import PathIndex
+from strategy_runner import demand_hops, order_demands
+
+MODES = ('ilp', 'lp', 'colgen')
+
+
+# 1. Mô hình path-based: mỗi cột là một cặp (demand, đường đi), biến x = 1 nếu demand đi trên đường đó
+class PathModel:
+    """Ràng buộc: mỗi demand chọn tối đa 1 đường, tổng bandwidth trên mỗi link <= capacity.
+
+    Demand có source == target không dùng link nào nên không vào mô hình; chúng luôn được chấp nhận
+    (như các heuristic) và giữ trong local.
+    """
+
+    def __init__(self, state, demands):
+        self.state = state
+        self.bandwidth = demands['bandwidth'].astype(np.float64)
+        self.pairs = {}
+        self.local = []
+        for i, (s, t) in enumerate(zip(demands['source'].tolist(), demands['target'].tolist())):
+            if s in state.node_index and t in state.node_index:
+                if s == t:
+                    self.local.append(i)
+                else:
+                    self.pairs[i] = (state.node_index[s], state.node_index[t])
+        self.columns = []
+        self.seen = set()
+
+    def add_column(self, demand, eids):
+        """Thêm cột nếu chưa có và khả thi về capacity, trả về True nếu thêm mới"""
+        eids = np.asarray(eids, dtype=np.int32)
+        key = (demand, eids.tobytes())
+        if key in self.seen or (self.state.capacity[eids] < self.bandwidth[demand]).any():
+            return False
+        self.seen.add(key)
+        self.columns.append((demand, eids))
+        return True
+
+    def matrix(self):
+        """Ma trận ràng buộc thưa: D dòng demand, sau đó E dòng link"""
+        num_demands = len(self.bandwidth)
+        rows, cols, vals = [], [], []
+        for j, (demand, eids) in enumerate(self.columns):
+            rows.append(demand)
+            cols.append(j)
+            vals.append(1.0)
+            rows.extend((num_demands + eids).tolist())
+            cols.extend([j] * len(eids))
+            vals.extend([self.bandwidth[demand]] * len(eids))
+        shape = (num_demands + self.state.num_edges, len(self.columns))
+        upper = np.concatenate([np.ones(num_demands), self.state.capacity])
+        return csr_matrix((vals, (rows, cols)), shape=shape), upper
+
+    def solve_lp(self):
+        """LP relaxation trên các cột hiện có: (giá trị, x, dual demand, dual link)"""
+        A, upper = self.matrix()
+        res = linprog(-np.ones(len(self.columns)), A_ub=A, b_ub=upper, bounds=(0, None), method='highs')
+        if res.status != 0:
+            raise RuntimeError(f"LP không giải được: {res.message}")
+        # HiGHS trả về marginals <= 0 cho ràng buộc <= của bài toán min, đổi dấu thành giá dual
+        duals = -res.ineqlin.marginals
+        num_demands = len(self.bandwidth)
+        return -res.fun, res.x, duals[:num_demands], duals[num_demands:]
+
+    def solve_ilp(self, incumbent=0, time_limit=None, mip_rel_gap=1e-4):
+        """MILP trên các cột hiện có, ràng buộc thêm số demand >= incumbent.
+
+        scipy.optimize.milp không nhận lời giải ban đầu (MIP start), nên "warm start" chỉ gồm các cột
+        của lời giải heuristic cộng với lát cắt sum x >= incumbent; HiGHS vẫn tự tìm lời giải khả thi.
+        """
+        A, upper = self.matrix()
+        n = len(self.columns)
+        constraints = [LinearConstraint(A, -np.inf, upper)]
+        if incumbent > 0:
+            constraints.append(LinearConstraint(csr_matrix(np.ones((1, n))), incumbent, np.inf))
+        options = {'mip_rel_gap': mip_rel_gap}
+        if time_limit is not None:
+            options['time_limit'] = time_limit
+        res = milp(-np.ones(n), integrality=np.ones(n), bounds=Bounds(0, 1),
+                   constraints=constraints, options=options)
+        bound = -res.mip_dual_bound if getattr(res, 'mip_dual_bound', None) is not None else np.inf
+        if res.x is None:
+            return None, bound, res.message
+        chosen = np.flatnonzero(res.x > 0.5)
+        return {self.columns[j][0]: self.columns[j][1] for j in chosen.tolist()}, bound, res.message
+
+    # 2. Pricing cho column generation: đường có reduced profit 1 - pi_d - bw_d * sum(mu_e) > 0
+    def price(self, demand_duals, link_duals, tol=1e-9):
+        state = self.state
+        # Phá hòa bằng distance rất nhỏ để ưu tiên đường ngắn khi nhiều link có dual = 0
+        tie = 1e-6 / max(float(state.distance.sum()), 1.0)
+        weight = (link_duals + tie * state.distance).tolist()
+        capacity = state.capacity.tolist()
+        cache = {}
+        added = 0
+        for demand, (s, t) in self.pairs.items():
+            bw = float(self.bandwidth[demand])
+            key = (s, t, bw)
+            if key not in cache:
+                found = residual_shortest_path(state, s, t, 0.0,
+                                               cost=lambda e: None if capacity[e] < bw else weight[e])
+                cache[key] = None if found is None else found[1]
+            eids = cache[key]
+            if eids is None:
+                continue
+            reduced = 1.0 - demand_duals[demand] - bw * float(link_duals[eids].sum())
+            if reduced > tol and self.add_column(demand, eids):
+                added += 1
+        return added
+
+
+# 3. Warm start: lời giải heuristic (first-fit theo một thứ tự) làm cột ban đầu và cận dưới
+def heuristic_routes(state, demands, ordering='bandwidth'):
+    """Định tuyến tham lam (state được reset trước và sau), trả về {chỉ số demand: edge ids}"""
+    state.reset()
+    engine = AdmissionEngine(state, PathIndex(state))
+    routes = {}
+    for i in order_demands(demands, demand_hops(state, demands), ordering).tolist():
+        seq, source, target, bandwidth = demands[i].tolist()
+        if source not in state.node_index or target not in state.node_index:
+            continue
+        found = engine.route(source, target, bandwidth)
+        if found is not None:
+            engine.reserve(found[1], bandwidth, seq)
+            routes[i] = found[1]
+    state.reset()
+    return routes
+
+
+def solve(state, demands, mode='ilp', k=8, warm_start=None, time_limit=None, max_iterations=200):
+    """Giải admission chính xác (ilp), LP relaxation (lp) hoặc column generation (colgen).
+
+    warm_start: {seq: edge ids} từ heuristic (ví dụ optimizer.optimise()['routes']).
+    Trả về dict: count, bound, upper_bound, gap, routes {seq: edge ids}, local, columns, iterations, seconds.
+    bound chỉ là cận trên trên tập đường ứng viên đã có (k đường, hoặc các cột đã sinh);
+    upper_bound là cận trên thật của N_max, chỉ có khi colgen hội tụ (pricing không còn cột cải thiện),
+    ngược lại None. gap tính theo upper_bound nếu có, nếu không theo bound.
+    Demand có source == target (local) được tính là chấp nhận với đường rỗng, có trong count, bound và
+    routes để so được với các heuristic.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Không có mode '{mode}', chọn một trong {MODES}")
+    start = time.perf_counter()
+    demands = np.asarray(demands, dtype=DEMAND_DTYPE) if not isinstance(demands, np.ndarray) else demands
+    seqs = demands['seq'].tolist()
+    position = {seq: i for i, seq in enumerate(seqs)}
+    model = PathModel(state, demands)
+
+    warm = {}
+    for seq, eids in (warm_start or {}).items():
+        if position.get(seq) in model.pairs and model.add_column(position[seq], eids):
+            warm[position[seq]] = np.asarray(eids, dtype=np.int32)
+
+    iterations = 0
+    converged = False
+    if mode == 'colgen':
+        # Master ban đầu: warm start + đường ngắn nhất của mỗi demand, sau đó sinh cột đến khi hội tụ
+        path_index = PathIndex(state, k=1)
+        for demand, (s, t) in model.pairs.items():
+            for eids in path_index.candidates(s, t):
+                model.add_column(demand, eids)
+        while iterations < max_iterations:
+            iterations += 1
+            bound, _, demand_duals, link_duals = model.solve_lp()
+            if not model.price(demand_duals, link_duals):
+                converged = True
+                break
+        if not converged:
+            # Chưa hội tụ (hoặc max_iterations=0): LP cuối chưa gồm các cột vừa sinh, giải lại trên tập cột hiện tại
+            bound = model.solve_lp()[0]
+    else:
+        path_index = PathIndex(state, k=k)
+        for demand, (s, t) in model.pairs.items():
+            for eids in path_index.candidates(s, t):
+                model.add_column(demand, eids)
+        bound = model.solve_lp()[0]
+
+    # LP trên toàn bộ tập đường chỉ bằng LP của master khi pricing đã hội tụ
+    local = len(model.local)
+    bound += local
+    upper_bound = bound if converged else None
+    result = {'mode': mode, 'bound': bound, 'upper_bound': upper_bound, 'local': local,
+              'columns': len(model.columns), 'iterations': iterations, 'warm_start': len(warm)}
+    if mode == 'lp':
+        result.update(count=None, routes={}, gap=None, status='LP relaxation')
+    else:
+        routes, mip_bound, status = model.solve_ilp(len(warm), time_limit)
+        if routes is None or len(routes) < len(warm):
+            routes, status = warm, f"giữ lời giải warm start ({status})"
+        routes = {**routes, **{demand: np.zeros(0, dtype=np.int32) for demand in model.local}}
+        count = len(routes)
+        # Cận dual của MILP chỉ đúng trên tập cột của master, không phải cận trên của N_max
+        bound = min(bound, mip_bound + local)
+        reference = bound if upper_bound is None else upper_bound
+        result.update(count=count, status=status, bound=bound, gap=(reference - count) / max(reference, 1e-9),
+                      routes={seqs[d]: eids.tolist() for d, eids in routes.items()})
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+# 4. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="Admission tối ưu bằng ILP / LP relaxation / column generation")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('demands', help="File demands CSV hoặc JSONL")
+    parser.add_argument('--mode', choices=MODES, default='ilp')
+    parser.add_argument('--k', type=int, default=8, help="Số đường ứng viên mỗi cặp node (mode ilp/lp)")
+    parser.add_argument('--warm-start', default='bandwidth',
+                        help="Thứ tự heuristic cho warm start (arrival, bandwidth, bandwidth_hops) hoặc 'none'")
+    parser.add_argument('--time-limit', type=float, default=None, help="Giới hạn thời gian MILP (giây)")
+    args = parser.parse_args()
+
+    from topology_cache import load_topology
+    state = load_topology(args.topology)
+    batches = list(iter_demand_batches(args.demands))
+    demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+
+    warm_start = None
+    if args.warm_start != 'none':
+        seqs = demands['seq'].tolist()
+        warm_start = {seqs[i]: eids for i, eids in heuristic_routes(state, demands, args.warm_start).items()}
+        print(f"Warm start ({args.warm_start}): {len(warm_start)}/{len(demands)} demands")
+
+    result = solve(state, demands, args.mode, args.k, warm_start, args.time_limit)
+    print(f"Số cột (demand, path): {result['columns']}, số vòng sinh cột: {result['iterations']}")
+    if result['local']:
+        print(f"Demand có source == target (luôn chấp nhận, đã tính vào N_max): {result['local']}")
+    scope = "trong tập đường ứng viên"
+    if result['count'] is None:
+        print(f"LP relaxation {scope}: <= {result['bound']:.2f}")
+    else:
+        print(f"N_max = {result['count']}/{len(demands)} demands ({result['status']})")
+        if result['upper_bound'] is not None:
+            print(f"Cận trên N_max: {result['upper_bound']:.2f}, gap: {result['gap'] * 100:.2f}%")
+        else:
+            print(f"Cận trên {scope} (không phải cận trên của N_max): {result['bound']:.2f}, "
+                  f"gap {scope}: {result['gap'] * 100:.2f}%")
+    print(f"Thời gian: {result['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import atexit
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+# Context rỗng dùng lại khi tắt đo: chi phí chỉ là một lần gọi hàm và một phép kiểm tra cờ
+_NULL = nullcontext()
+
+
+# 1. Một khoảng thời gian (phase) đang đo
+class _Span:
+    __slots__ = ('profiler', 'name', 'args', 'latency', 'start')
+
+    def __init__(self, profiler, name, args, latency=False):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.latency = latency
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, time.perf_counter() - self.start, self.args, self.latency)
+        return False
+
+
+# 2. Bộ đo: thời gian theo phase, độ trễ từng demand, số lần tìm đường và số cạnh đã duyệt
+class Profiler:
+    """Mặc định tắt. Bật bằng enable() hoặc biến môi trường INFONET_PROFILE.
+
+    Code nóng chỉ gọi phase()/demand() (trả về context rỗng khi tắt) hoặc kiểm tra
+    PROFILER.enabled trước khi gọi count()/search().
+    """
+
+    def __init__(self, max_events=200000):
+        self.enabled = False
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        self.phases = defaultdict(lambda: [0, 0.0])  # tên -> [số lần, tổng giây]
+        self.counters = defaultdict(int)
+        self.latencies = []
+        self.events = []
+        self.dropped = 0
+        self.origin = time.perf_counter()
+
+    def enable(self, max_events=None):
+        if max_events is not None:
+            self.max_events = max_events
+        self.reset()
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+
+    def phase(self, name, **args):
+        """with PROFILER.phase('route'): ... ghi tổng thời gian theo tên và một sự kiện trên timeline"""
+        if not self.enabled:
+            return _NULL
+        return _Span(self, name, args)
+
+    def demand(self, seq):
+        """Như phase('demand') nhưng còn ghi độ trễ định tuyến của demand để tính percentile"""
+        if not self.enabled:
+            return _NULL
+        return _Span(self, 'demand', {'seq': seq}, latency=True)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def search(self, kind, indptr, settled):
+        """Một lần Dijkstra: settled là tập node đã chốt, mỗi node đã duyệt hết danh sách kề"""
+        self.counters[kind] += 1
+        self.counters[f"{kind}_edges"] += sum(indptr[u + 1] - indptr[u] for u in settled)
+
+    def _record(self, name, start, seconds, args, latency):
+        entry = self.phases[name]
+        entry[0] += 1
+        entry[1] += seconds
+        if latency:
+            self.latencies.append(seconds)
+        if len(self.events) < self.max_events:
+            self.events.append({'name': name, 'ph': 'X', 'ts': (start - self.origin) * 1e6, 'dur': seconds * 1e6,
+                                'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+        else:
+            self.dropped += 1
+
+    # 3. Xuất kết quả
+    def percentile(self, q):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(max(math.ceil(q / 100 * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+    def summary(self):
+        """Bảng tóm tắt: phase theo tổng thời gian giảm dần, độ trễ demand, các bộ đếm"""
+        lines = [f"{'Phase':<24} {'Số lần':>10} {'Tổng (s)':>10} {'TB (ms)':>10}", "-" * 57]
+        for name, (n, seconds) in sorted(self.phases.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<24} {n:>10} {seconds:>10.4f} {seconds / n * 1000:>10.4f}")
+        if self.latencies:
+            lines.append(f"\nĐộ trễ định tuyến mỗi demand ({len(self.latencies)} demands): "
+                         f"p50 {self.percentile(50) * 1000:.3f} ms, p95 {self.percentile(95) * 1000:.3f} ms, "
+                         f"p99 {self.percentile(99) * 1000:.3f} ms, max {max(self.latencies) * 1000:.3f} ms")
+        if self.counters:
+            lines.append("\nBộ đếm:")
+            lines.extend(f"  {name}: {n}" for name, n in sorted(self.counters.items()))
+        if self.dropped:
+            lines.append(f"\n(Bỏ {self.dropped} sự kiện timeline sau giới hạn {self.max_events})")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Timeline dạng Chrome trace (mở bằng chrome://tracing hoặc Perfetto)"""
+        trace = {'traceEvents': [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                                  'args': {'name': os.path.basename(sys.argv[0]) or 'python'}}] + self.events,
+                 'displayTimeUnit': 'ms',
+                 'otherData': {'phases': {name: {'count': n, 'seconds': s} for name, (n, s) in self.phases.items()},
+                               'counters': dict(self.counters), 'dropped_events': self.dropped}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        return path
+
+    def report(self, trace_path=None):
+        print("\n" + "=" * 57)
+        print("PROFILE")
+        print("=" * 57)
+        print(self.summary())
+        if trace_path:
+            print(f"Timeline (Chrome trace): {self.write_trace(trace_path)}")
+
+
+PROFILER = Profiler()
+
+
+def default_trace_path(value):
+    """INFONET_PROFILE=1 -> <tên script>_trace.json, giá trị khác là đường dẫn file trace"""
+    if value != '1':
+        return value
+    return f"{os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'}_trace.json"
+
+
+# 4. Bật qua biến môi trường: đo cả chương trình, in bảng và ghi timeline khi thoát
+if os.environ.get('INFONET_PROFILE', '0') not in ('', '0'):
+    PROFILER.enable()
+    atexit.register(PROFILER.report, default_trace_path(os.environ['INFONET_PROFILE']))
@@ -0,0 +1,130 @@
+import heapq
+from itertools import count
+from instrumentation import PROFILER
+
+
+# 1. Dijkstra trên CSR với tập node/link bị cấm (dùng cho spur path của Yen)
+def _dijkstra(adjacency, weight, usable, source, target, banned_nodes=(), banned_edges=()):
+    indptr, indices, edge_ids, _ = adjacency
+    dist = {source: 0.0}
+    prev = {source: None}
+    done = set()
+    tie = count()
+    heap = [(0.0, next(tie), source)]
+
+    while heap:
+        d, _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        if u == target:
+            nodes, eids = [u], []
+            while prev[nodes[-1]] is not None:
+                p, e = prev[nodes[-1]]
+                nodes.append(p)
+                eids.append(e)
+            if PROFILER.enabled:
+                PROFILER.search('ksp_dijkstra', indptr, done)
+            return d, nodes[::-1], eids[::-1]
+        done.add(u)
+
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            e = edge_ids[k]
+            if v in done or v in banned_nodes or not usable[e] or e in banned_edges:
+                continue
+            nd = d + weight[e]
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                prev[v] = (u, e)
+                heapq.heappush(heap, (nd, next(tie), v))
+
+    if PROFILER.enabled:
+        PROFILER.search('ksp_dijkstra', indptr, done)
+    return None
+
+
+# 2. Yen k-shortest simple paths, cắt tỉa theo residual
+def yen_k_shortest_paths(state, source, target, k, bandwidth=0.0, weight=None):
+    """k đường đi đơn ngắn nhất (theo chỉ số node) chỉ qua các link có residual >= bandwidth.
+
+    weight: mảng trọng số theo edge id (mặc định distance).
+    Trả về list (cost, nodes, eids) theo cost tăng dần.
+    Dùng cải tiến Lawler: path mới chỉ sinh spur từ điểm rẽ nhánh của nó trở đi,
+    chi phí root path lấy từ tổng tiền tố thay vì tính lại.
+    """
+    if PROFILER.enabled:
+        PROFILER.count('yen')
+    adjacency = state.adjacency()
+    weight = (state.distance if weight is None else weight).tolist()
+    usable = (state.residual >= bandwidth).tolist()
+
+    first = _dijkstra(adjacency, weight, usable, source, target)
+    if first is None:
+        return []
+
+    accepted = [first + (0,)]
+    seen = {tuple(first[2])}
+    candidates = []
+    tie = count()
+
+    while len(accepted) < k:
+        _, nodes, eids, deviation = accepted[-1]
+        prefix = [0.0]
+        for e in eids:
+            prefix.append(prefix[-1] + weight[e])
+
+        for i in range(deviation, len(nodes) - 1):
+            root = nodes[:i + 1]
+            banned_edges = {p_eids[i] for _, p_nodes, p_eids, _ in accepted
+                            if len(p_eids) > i and p_nodes[:i + 1] == root}
+            spur = _dijkstra(adjacency, weight, usable, nodes[i], target,
+                             set(root[:-1]), banned_edges)
+            if spur is None:
+                continue
+            spur_cost, spur_nodes, spur_eids = spur
+            path_eids = eids[:i] + spur_eids
+            key = tuple(path_eids)
+            if key in seen:
+                continue
+            seen.add(key)
+            heapq.heappush(candidates, (prefix[i] + spur_cost, next(tie),
+                                        root[:-1] + spur_nodes, path_eids, i))
+
+        if not candidates:
+            break
+        cost, _, path_nodes, path_eids, deviation = heapq.heappop(candidates)
+        accepted.append((cost, path_nodes, path_eids, deviation))
+
+    return [(cost, nodes, eids) for cost, nodes, eids, _ in accepted]
+
+
+# 3. Engine k-shortest paths có cache theo cặp (source, target)
+class KShortestPaths:
+    """Cache tập đường ứng viên; chỉ tính lại khi một link trên path đã cache tụt dưới bandwidth yêu cầu.
+
+    weight: hàm weight(state) trả về mảng trọng số theo edge id (None = distance),
+    được tính tại thời điểm dựng lại tập ứng viên.
+    """
+
+    def __init__(self, state, k, weight=None):
+        self.state = state
+        self.k = k
+        self.weight = weight
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def paths(self, source, target, bandwidth=0.0):
+        entry = self.cache.get((source, target))
+        if entry is not None and all(self.state.bottleneck(eids) >= bandwidth for _, _, eids in entry):
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        weight = None if self.weight is None else self.weight(self.state)
+        entry = yen_k_shortest_paths(self.state, source, target, self.k, bandwidth, weight)
+        self.cache[(source, target)] = entry
+        return entry
+
+    def clear(self):
+        self.cache.clear()
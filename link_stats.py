@@ -0,0 +1,99 @@
+import math
+from collections import Counter
+import numpy as np
+
+# Các nhóm utilization dùng trong báo cáo (cận trên, theo %)
+UTIL_RANGES = (('0-30%', 30), ('30-70%', 70), ('70-100%', math.inf))
+HOT_THRESHOLD = 0.7
+
+
+# 1. Thống kê utilization cập nhật tăng dần theo từng link thay đổi flow
+class LinkStats:
+    """Tổng utilization, phân bố theo nhóm, tập link nóng và histogram 1% để tính percentile.
+
+    Gắn vào NetworkState bằng state.attach(stats): mỗi reserve/release gọi update(eids),
+    mỗi lần reset gọi refresh(). Chi phí O(1) cho mỗi link bị chạm. Capacity đọc từ state mỗi lần
+    update, nên link bị đặt capacity 0 (survivability) ra khỏi thống kê và trở lại khi được khôi phục.
+    """
+
+    def __init__(self, state, hot_threshold=HOT_THRESHOLD, resolution=100):
+        self.state = state
+        self.hot_threshold = hot_threshold
+        self.resolution = resolution
+        self.capacity_counts = Counter(float(c) for c in state.capacity.tolist())
+        self.refresh()
+
+    def _range(self, util):
+        util_pct = util * 100
+        for i, (_, upper) in enumerate(UTIL_RANGES):
+            if util_pct <= upper:
+                return i
+        return len(UTIL_RANGES) - 1
+
+    def _bucket(self, util):
+        return min(max(int(util * self.resolution), 0), self.resolution)
+
+    def _add(self, e, util):
+        self.util[e] = util
+        self.total += util
+        self.count += 1
+        self.ranges[self._range(util)] += 1
+        self.histogram[self._bucket(util)] += 1
+        if util > self.hot_threshold:
+            self.hot.add(e)
+
+    def _remove(self, e):
+        util = self.util[e]
+        self.util[e] = None
+        self.total -= util
+        self.count -= 1
+        self.ranges[self._range(util)] -= 1
+        self.histogram[self._bucket(util)] -= 1
+        self.hot.discard(e)
+
+    def refresh(self):
+        """Tính lại toàn bộ từ flow hiện tại (sau reset hoặc khi flow bị sửa trực tiếp)"""
+        self.util = [None] * self.state.num_edges
+        self.total = 0.0
+        self.ranges = [0] * len(UTIL_RANGES)
+        self.histogram = [0] * (self.resolution + 1)
+        self.hot = set()
+        self.count = 0
+        for e, (flow, capacity) in enumerate(zip(self.state.flow.tolist(), self.state.capacity.tolist())):
+            if capacity > 0:
+                self._add(e, flow / capacity)
+        # Tổng cộng dồn qua nhiều update bị trôi số: tính lại chính xác từ giá trị từng link
+        self.total = math.fsum(util for util in self.util if util is not None)
+
+    def update(self, eids):
+        flow, capacity = self.state.flow, self.state.capacity
+        for e in (eids.tolist() if isinstance(eids, np.ndarray) else eids):
+            if self.util[e] is not None:
+                self._remove(e)
+            if capacity[e] > 0:
+                self._add(e, float(flow[e]) / float(capacity[e]))
+
+    # 2. Truy vấn bất kỳ lúc nào trong quá trình admission
+    def average(self):
+        """Utilization trung bình (0..1) trên các link có capacity > 0"""
+        return self.total / self.count if self.count else 0.0
+
+    def distribution(self):
+        """{'0-30%': số link, '30-70%': ..., '70-100%': ...}"""
+        return {name: n for (name, _), n in zip(UTIL_RANGES, self.ranges)}
+
+    def hot_links(self):
+        """Các link có utilization > hot_threshold: list (u, v, utilization) theo edge id"""
+        return [(*self.state.edge_label(e), self.util[e]) for e in sorted(self.hot)]
+
+    def percentile(self, q):
+        """Percentile q (0..100) của utilization: cận dưới của nhóm chứa nó, độ chính xác 1/resolution"""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(q / 100 * self.count), 1)
+        seen = 0
+        for bucket, n in enumerate(self.histogram):
+            seen += n
+            if seen >= rank:
+                return bucket / self.resolution
+        return 1.0
@@ -0,0 +1,170 @@
+import heapq
+import math
+import numpy as np
+from itertools import count
+
+from admission import residual_shortest_path
+from instrumentation import PROFILER
+
+EPS = 1e-9
+
+
+# 1. Dinic trên residual của NetworkState, giới hạn ở bandwidth của demand
+class MaxFlowSplitter:
+    """Chia một demand trên nhiều đường bằng max-flow (Dinic) giữa source và target.
+
+    Link vô hướng: flow f[e] > 0 là chiều src -> dst, |f[e]| <= residual[e]. Flow lưu dạng dict
+    theo edge id nên mỗi demand chỉ chạm các link nó dùng. Gắn vào NetworkState như observer
+    (giữ bản sao residual dạng list, cập nhật theo các link thay đổi), nên residual graph được
+    dùng lại giữa các demand thay vì dựng lại.
+    attach=False: chỉ chụp residual một lần, dùng cho một lần gọi đơn lẻ.
+    """
+
+    def __init__(self, state, attach=True):
+        self.state = state
+        self.src = state.src.tolist()
+        self.dst = state.dst.tolist()
+        self.refresh()
+        if attach:
+            state.attach(self)
+
+    def refresh(self):
+        self.residual = self.state.residual.tolist()
+
+    def update(self, eids):
+        residual = self.state.residual
+        for e in (eids.tolist() if isinstance(eids, np.ndarray) else eids):
+            self.residual[e] = float(residual[e])
+
+    def _capacity(self, u, e, flow):
+        f = flow.get(e, 0.0)
+        return self.residual[e] - f if self.src[e] == u else self.residual[e] + f
+
+    def _levels(self, source, target, flow):
+        """BFS trên residual graph; None nếu target không tới được"""
+        indptr, indices, edge_ids, _ = self.state.adjacency()
+        level = {source: 0}
+        frontier = [source]
+        while frontier and target not in level:
+            nxt = []
+            for u in frontier:
+                for k in range(indptr[u], indptr[u + 1]):
+                    v = indices[k]
+                    if v not in level and self._capacity(u, edge_ids[k], flow) > EPS:
+                        level[v] = level[u] + 1
+                        nxt.append(v)
+            frontier = nxt
+        return level if target in level else None
+
+    def _augment(self, source, target, limit, level, pointer, flow):
+        """Một đường tăng luồng trong level graph (DFS lặp với con trỏ cung hiện tại)"""
+        indptr, indices, edge_ids, _ = self.state.adjacency()
+        nodes, arcs = [source], []
+        while True:
+            u = nodes[-1]
+            if u == target:
+                push = min(limit, min(self._capacity(a, e, flow) for a, e in arcs))
+                for a, e in arcs:
+                    flow[e] = flow.get(e, 0.0) + (push if self.src[e] == a else -push)
+                return push
+            k = pointer.setdefault(u, indptr[u])
+            while k < indptr[u + 1]:
+                v, e = indices[k], edge_ids[k]
+                if level.get(v) == level[u] + 1 and self._capacity(u, e, flow) > EPS:
+                    break
+                k += 1
+            pointer[u] = k
+            if k < indptr[u + 1]:
+                nodes.append(v)
+                arcs.append((u, e))
+                continue
+            if u == source:
+                return 0.0
+            # Ngõ cụt: bỏ node khỏi level graph, lùi lại và bỏ qua cung vừa đi
+            level[u] = -1
+            nodes.pop()
+            arcs.pop()
+            pointer[nodes[-1]] += 1
+
+    def max_flow(self, source, target, bandwidth):
+        """Flow tối đa (không quá bandwidth): (giá trị, dict edge id -> flow có hướng)"""
+        flow = {}
+        value = 0.0
+        phases = 0
+        while value < bandwidth - EPS:
+            level = self._levels(source, target, flow)
+            if level is None:
+                break
+            phases += 1
+            pointer = {}
+            while value < bandwidth - EPS:
+                push = self._augment(source, target, bandwidth - value, level, pointer, flow)
+                if push <= EPS:
+                    break
+                value += push
+        if PROFILER.enabled:
+            PROFILER.count('dinic')
+            PROFILER.count('dinic_phases', phases)
+        return value, flow
+
+    # 2. Phân rã flow thành ít đường: mỗi lần lấy đường rộng nhất trong đồ thị flow
+    def decompose(self, source, target, flow):
+        """List (nodes, eids, bandwidth) theo bandwidth giảm dần; các vòng flow (không mang
+        flow source -> target) bị bỏ qua"""
+        src, dst = self.src, self.dst
+        out = {}
+        for e, f in flow.items():
+            if f > EPS:
+                out.setdefault(src[e], {})[e] = f
+            elif f < -EPS:
+                out.setdefault(dst[e], {})[e] = -f
+        paths = []
+        tie = count()
+        while True:
+            # Dijkstra cực đại bottleneck trên các cung còn flow
+            best = {source: math.inf}
+            prev = {source: None}
+            done = set()
+            heap = [(-math.inf, next(tie), source)]
+            while heap:
+                neg_width, _, u = heapq.heappop(heap)
+                if u in done:
+                    continue
+                done.add(u)
+                if u == target:
+                    break
+                for e, f in out.get(u, {}).items():
+                    v = dst[e] if src[e] == u else src[e]
+                    width = min(-neg_width, f)
+                    if v not in done and width > best.get(v, 0.0):
+                        best[v] = width
+                        prev[v] = (u, e)
+                        heapq.heappush(heap, (-width, next(tie), v))
+            if target not in done:
+                return paths
+            width = best[target]
+            nodes, eids = [target], []
+            while prev[nodes[-1]] is not None:
+                u, e = prev[nodes[-1]]
+                nodes.append(u)
+                eids.append(e)
+                out[u][e] -= width
+                if out[u][e] <= EPS:
+                    del out[u][e]
+            paths.append((nodes[::-1], eids[::-1], width))
+
+    def split(self, source, target, bandwidth, max_paths=None):
+        """Cấp phát bandwidth từ source tới target (theo chỉ số node) trên ít đường nhất có thể.
+
+        Thử một Dijkstra trước (một đường đủ bandwidth là tối ưu về số đường), chỉ chạy max-flow khi
+        phải chia. max_paths: giữ tối đa số đường này (các đường rộng nhất).
+        Trả về (list (nodes, eids, bandwidth), phần bandwidth chưa cấp phát được).
+        """
+        found = residual_shortest_path(self.state, source, target, bandwidth)
+        if found is not None:
+            return [(found[0], found[1], bandwidth)], 0.0
+        value, flow = self.max_flow(source, target, bandwidth)
+        if value <= EPS:
+            return [], bandwidth
+        paths = self.decompose(source, target, flow)[:max_paths]
+        return paths, max(bandwidth - sum(width for _, _, width in paths), 0.0)
@@ -0,0 +1,85 @@
+import argparse
+import json
+import time
+import networkx as nx
+
+from spanning_tree import kruskal_mst, prim_mst, prim_mst_scan
+from synthetic import geographic_knn
+
+# Giới hạn số node cho các cách chậm (bỏ qua khi đồ thị lớn hơn)
+SCAN_LIMIT = 3000
+NETWORKX_LIMIT = 200000
+
+
+def to_networkx(state):
+    graph = nx.Graph()
+    graph.add_nodes_from(range(state.num_nodes))
+    graph.add_weighted_edges_from(zip(state.src.tolist(), state.dst.tolist(), state.distance.tolist()),
+                                  weight='distance')
+    return graph
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+# 1. Đo một kích thước đồ thị: Prim heap, Kruskal, nx.minimum_spanning_tree, Prim gốc (O(V*E))
+def bench_size(n, k=3, seed=0, scan_limit=SCAN_LIMIT, networkx_limit=NETWORKX_LIMIT):
+    state, build_seconds = timed(geographic_knn, n, k, seed)
+    state.adjacency()
+    rows = []
+
+    (eids, total), seconds = timed(prim_mst, state)
+    rows.append(('prim_heap', seconds, len(eids), total))
+    (eids, total), seconds = timed(kruskal_mst, state)
+    rows.append(('kruskal', seconds, len(eids), total))
+
+    if n <= networkx_limit or n <= scan_limit:
+        graph = to_networkx(state)
+        if n <= networkx_limit:
+            tree, seconds = timed(nx.minimum_spanning_tree, graph, 'distance')
+            rows.append(('networkx', seconds, tree.number_of_edges(), tree.size(weight='distance')))
+        if n <= scan_limit:
+            (edges, total), seconds = timed(prim_mst_scan, graph)
+            rows.append(('prim_scan', seconds, len(edges), total))
+
+    return {'nodes': n, 'edges': state.num_edges, 'build_seconds': build_seconds,
+            'results': [{'method': m, 'seconds': s, 'tree_edges': t, 'total_distance': d}
+                        for m, s, t, d in rows]}
+
+
+HEADER = f"{'Nodes':>9} {'Edges':>9} {'Method':<10} {'Time (s)':>10} {'Tree edges':>11} {'Total (km)':>16}"
+
+
+def format_rows(report):
+    return "\n".join(f"{report['nodes']:>9} {report['edges']:>9} {r['method']:<10} {r['seconds']:>10.4f} "
+                     f"{r['tree_edges']:>11} {r['total_distance']:>16.2f}" for r in report['results'])
+
+
+# 2. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="So sánh tốc độ Prim (heap), Kruskal, NetworkX và Prim gốc")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--k', type=int, default=3, help="Số láng giềng gần nhất của mỗi node")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scan-limit', type=int, default=SCAN_LIMIT)
+    parser.add_argument('--networkx-limit', type=int, default=NETWORKX_LIMIT)
+    parser.add_argument('--json', default=None, help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    print(HEADER)
+    print("-" * len(HEADER))
+    reports = []
+    for n in args.sizes:
+        reports.append(bench_size(n, args.k, args.seed, args.scan_limit, args.networkx_limit))
+        print(format_rows(reports[-1]), flush=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import heapq
+import math
+import networkx as nx
+import numpy as np
+from geo import capacity_tiers, edge_distances
+
+
+# 1. Trạng thái mạng dạng mảng: adjacency CSR + mảng NumPy theo edge id
+class NetworkState:
+    """Mỗi link có một edge id; capacity/flow/residual là các mảng song song"""
+
+    def __init__(self, nodes, src, dst, distance, capacity, latitude=None, longitude=None, csr=None,
+                 adjacency=None):
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.distance = np.asarray(distance, dtype=np.float64)
+        self.capacity = np.asarray(capacity, dtype=np.float64)
+        self.latitude = None if latitude is None else np.asarray(latitude, dtype=np.float64)
+        self.longitude = None if longitude is None else np.asarray(longitude, dtype=np.float64)
+        self.flow = np.zeros(len(self.src), dtype=np.float64)
+        self.residual = self.capacity.copy()
+        # demandsID của mỗi link: dict seq -> số lần reserve (xóa O(1), giữ thứ tự thêm vào)
+        self.demand_ids = [{} for _ in range(len(self.src))]
+        # Bản ghi theo demand: seq -> list (edge ids, bandwidth) đã reserve, để teardown O(độ dài path)
+        self.reservations = {}
+        # Các đối tượng theo dõi flow (ví dụ LinkStats): update(eids) sau mỗi thay đổi, refresh() khi reset
+        self.observers = []
+        if csr is None:
+            self._build_csr()
+        else:
+            # CSR dựng sẵn (indptr, indices, edge_ids), ví dụ gắn từ shared memory;
+            # adjacency: list Python tương ứng dùng chung giữa nhiều state trên cùng topology
+            self.indptr, self.indices, self.edge_ids = csr
+            self._adjacency = adjacency
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Khởi tạo từ đồ thị GML: distance theo Haversine, capacity theo khoảng cách"""
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        lat = np.array([graph.nodes[n]['Latitude'] for n in nodes], dtype=np.float64)
+        lon = np.array([graph.nodes[n]['Longitude'] for n in nodes], dtype=np.float64)
+
+        edges = np.array([(index[u], index[v]) for u, v in graph.edges()], dtype=np.int32).reshape(-1, 2)
+        src, dst = edges[:, 0], edges[:, 1]
+        distance = edge_distances(lat, lon, src, dst)
+        capacity = capacity_tiers(distance)
+
+        return cls(nodes, src, dst, distance, capacity, lat, lon)
+
+    def _build_csr(self):
+        # Mỗi link vô hướng xuất hiện 2 lần trong CSR (u->v và v->u), cùng edge id
+        n, m = len(self.nodes), len(self.src)
+        heads = np.concatenate([self.src, self.dst])
+        tails = np.concatenate([self.dst, self.src])
+        eids = np.concatenate([np.arange(m), np.arange(m)])
+        order = np.argsort(heads, kind='stable')
+
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n), out=self.indptr[1:])
+        self.indices = tails[order].astype(np.int32)
+        self.edge_ids = eids[order].astype(np.int32)
+        self._adjacency = None
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.src)
+
+    def adjacency(self):
+        """CSR dưới dạng list Python (dùng trong các vòng lặp Dijkstra)"""
+        if self._adjacency is None:
+            self._adjacency = (self.indptr.tolist(), self.indices.tolist(),
+                               self.edge_ids.tolist(), self.distance.tolist())
+        return self._adjacency
+
+    def reset(self):
+        self.flow[:] = 0.0
+        self.residual[:] = self.capacity
+        self.demand_ids = [{} for _ in range(self.num_edges)]
+        self.reservations = {}
+        for observer in self.observers:
+            observer.refresh()
+
+    def attach(self, observer):
+        self.observers.append(observer)
+        return observer
+
+    def detach(self, observer):
+        """Bỏ observer đã gắn (không lỗi nếu đã bỏ)"""
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    def edge_between(self, i, j):
+        """Edge id của link (i, j) theo chỉ số node, -1 nếu không có"""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        hit = np.nonzero(self.indices[start:end] == j)[0]
+        return int(self.edge_ids[start + hit[0]]) if len(hit) else -1
+
+    def path_edges(self, path):
+        """Chuyển path (danh sách node label) thành mảng edge id"""
+        idx = [self.node_index[n] for n in path]
+        return np.array([self.edge_between(idx[k], idx[k + 1]) for k in range(len(idx) - 1)],
+                        dtype=np.int32)
+
+    def path_nodes(self, source, eids):
+        """Danh sách chỉ số node của path đi từ source theo các edge id"""
+        nodes = [source]
+        for e in eids:
+            u, v = int(self.src[e]), int(self.dst[e])
+            nodes.append(v if u == nodes[-1] else u)
+        return nodes
+
+    def edge_label(self, e):
+        return self.nodes[self.src[e]], self.nodes[self.dst[e]]
+
+    def bottleneck(self, eids):
+        return float(self.residual[eids].min()) if len(eids) else math.inf
+
+    def reserve(self, eids, bandwidth, seq=None):
+        self.flow[eids] += bandwidth
+        self.residual[eids] -= bandwidth
+        if seq is not None:
+            for e in eids:
+                held = self.demand_ids[e]
+                held[seq] = held.get(seq, 0) + 1
+            self.reservations.setdefault(seq, []).append((eids, bandwidth))
+        for observer in self.observers:
+            observer.update(eids)
+
+    def release(self, eids, bandwidth, seq=None):
+        """Trả lại bandwidth đã reserve trên các link (ngược với reserve)"""
+        self._unreserve(eids, bandwidth, seq)
+        if seq is not None:
+            records = self.reservations[seq]
+            for i, (held_eids, held_bw) in enumerate(records):
+                if held_bw == bandwidth and np.array_equal(held_eids, eids):
+                    del records[i]
+                    break
+            if not records:
+                del self.reservations[seq]
+
+    def teardown(self, seq):
+        """Giải phóng mọi bandwidth demand seq đang giữ, trả về số Mbps đã trả lại (0 nếu không có)"""
+        released = 0.0
+        for eids, bandwidth in reversed(self.reservations.pop(seq, ())):
+            self._unreserve(eids, bandwidth, seq)
+            released += bandwidth
+        return released
+
+    def _unreserve(self, eids, bandwidth, seq):
+        self.flow[eids] -= bandwidth
+        self.residual[eids] += bandwidth
+        if seq is not None:
+            for e in eids:
+                held = self.demand_ids[e]
+                if held[seq] == 1:
+                    del held[seq]
+                else:
+                    held[seq] -= 1
+        for observer in self.observers:
+            observer.update(eids)
+
+    def utilization(self):
+        util = np.zeros(self.num_edges, dtype=np.float64)
+        np.divide(self.flow, self.capacity, out=util, where=self.capacity > 0)
+        return util
+
+    def to_graph(self):
+        """Dựng lại đồ thị NetworkX (Latitude/Longitude + edge attribute) từ state"""
+        graph = nx.Graph()
+        for i, node in enumerate(self.nodes):
+            if self.latitude is None:
+                graph.add_node(node)
+            else:
+                graph.add_node(node, Latitude=float(self.latitude[i]), Longitude=float(self.longitude[i]))
+        graph.add_edges_from(self.edge_label(e) for e in range(self.num_edges))
+        return self.write_back(graph)
+
+    def write_back(self, graph):
+        """Ghi distance/capacity/flow/residual/demandsID về edge attribute của graph (để vẽ, báo cáo)"""
+        for e in range(self.num_edges):
+            u, v = self.edge_label(e)
+            data = graph[u][v]
+            data['distance'] = float(self.distance[e])
+            capacity = float(self.capacity[e])
+            data['capacity'] = int(capacity) if capacity.is_integer() else capacity
+            data['flow'] = float(self.flow[e])
+            data['residual'] = float(self.residual[e])
+            data['demandsID'] = list(self.demand_ids[e])
+        return graph
+
+
+# 2. Lịch rời mạng: demand có holding time được teardown khi thời gian mô phỏng vượt quá
+class DepartureSchedule:
+    """Heap (thời điểm rời, seq); advance(now) giải phóng mọi demand đã hết hạn"""
+
+    def __init__(self, state, on_release=None):
+        self.state = state
+        self.on_release = on_release or state.teardown
+        self.heap = []
+
+    def hold(self, seq, until):
+        heapq.heappush(self.heap, (until, seq))
+
+    def next_departure(self):
+        return self.heap[0][0] if self.heap else math.inf
+
+    def advance(self, now):
+        """Teardown các demand có thời điểm rời <= now, trả về list seq đã giải phóng"""
+        released = []
+        while self.heap and self.heap[0][0] <= now:
+            _, seq = heapq.heappop(self.heap)
+            self.on_release(seq)
+            released.append(seq)
+        return released
+
+    def __len__(self):
+        return len(self.heap)
@@ -0,0 +1,300 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from admission import residual_shortest_path
+from demand_stream import DEMAND_DTYPE, iter_demand_batches
+from path_index import PathIndex
+from strategy_runner import (SharedArrays, attach_arrays, demand_hops, order_demands,
+                             state_from_arrays, topology_arrays)
+
+# Các thứ tự khởi đầu lấy từ heuristic hiện có (test2.py, Nmax.py, FCFS.py)
+HEURISTIC_ORDERINGS = ('bandwidth', 'bandwidth_hops', 'arrival')
+
+
+# 1. Nhật ký thay đổi: mỗi bước và mỗi lần rollback chỉ tốn O(độ dài path)
+class Journal:
+    """Ghi lại reserve/release của từng demand để rollback về một mốc bất kỳ"""
+
+    def __init__(self, state):
+        self.state = state
+        self.routes = {}
+        self.log = []
+
+    def reserve(self, demand, eids, bandwidth):
+        self.state.reserve(eids, bandwidth, demand)
+        self.routes[demand] = eids
+        self.log.append((True, demand, eids, bandwidth))
+
+    def release(self, demand, bandwidth):
+        eids = self.routes.pop(demand)
+        self.state.release(eids, bandwidth, demand)
+        self.log.append((False, demand, eids, bandwidth))
+
+    def mark(self):
+        return len(self.log)
+
+    def rollback(self, mark):
+        while len(self.log) > mark:
+            reserved, demand, eids, bandwidth = self.log.pop()
+            if reserved:
+                self.state.release(eids, bandwidth, demand)
+                del self.routes[demand]
+            else:
+                self.state.reserve(eids, bandwidth, demand)
+                self.routes[demand] = eids
+
+    def commit(self):
+        self.log.clear()
+
+
+# 2. Tìm kiếm cục bộ rip-up-and-reroute trên một NetworkState
+class LocalSearch:
+    """Demand được đánh chỉ số theo vị trí trong mảng demands (không theo seq)"""
+
+    def __init__(self, state, demands, path_index, rng, max_victims=3):
+        self.state = state
+        self.path_index = path_index
+        self.rng = rng
+        self.max_victims = max_victims
+        self.bandwidth = demands['bandwidth'].tolist()
+        self.pairs = {}
+        for i, (s, t) in enumerate(zip(demands['source'].tolist(), demands['target'].tolist())):
+            if s in state.node_index and t in state.node_index:
+                self.pairs[i] = (state.node_index[s], state.node_index[t])
+        self.journal = Journal(state)
+
+    def route(self, demand):
+        """Đường ngắn nhất đủ residual cho demand (list edge id) hoặc None"""
+        s, t = self.pairs[demand]
+        bw = self.bandwidth[demand]
+        eids = self.path_index.first_fit(s, t, bw)
+        if eids is not None:
+            return eids.tolist()
+        found = residual_shortest_path(self.state, s, t, bw)
+        return None if found is None else found[1]
+
+    def construct(self, order):
+        """Xếp tham lam theo thứ tự cho trước, trả về danh sách demand bị từ chối"""
+        self.state.reset()
+        self.journal = Journal(self.state)
+        rejected = []
+        for demand in order:
+            eids = self.route(demand) if demand in self.pairs else None
+            if eids is None:
+                rejected.append(demand)
+            else:
+                self.journal.reserve(demand, eids, self.bandwidth[demand])
+        self.journal.commit()
+        return [d for d in rejected if d in self.pairs]
+
+    def _victims(self, cand, bandwidth):
+        """Tập demand tối thiểu (tham lam, bandwidth lớn trước) cần gỡ để cand đủ residual"""
+        residual = self.state.residual
+        routes = self.journal.routes
+        victims = set()
+        for e in cand[residual[cand] < bandwidth].tolist():
+            deficit = bandwidth - residual[e] - sum(self.bandwidth[v] for v in victims if e in routes[v])
+            if deficit <= 0:
+                continue
+            on_link = self.rng.permutation(list(self.state.demand_ids[e])).tolist()
+            for v in sorted(on_link, key=lambda d: -self.bandwidth[d]):
+                if v in victims:
+                    continue
+                victims.add(v)
+                deficit -= self.bandwidth[v]
+                if deficit <= 0:
+                    break
+        return victims
+
+    def try_insert(self, demand):
+        """Rip-up các demand chặn một đường ứng viên, chèn demand rồi reroute chúng; rollback nếu thất bại"""
+        eids = self.route(demand)
+        if eids is not None:
+            self.journal.reserve(demand, eids, self.bandwidth[demand])
+            self.journal.commit()
+            return True
+
+        bw = self.bandwidth[demand]
+        journal = self.journal
+        for cand in self.path_index.candidates(*self.pairs[demand]):
+            victims = self._victims(cand, bw)
+            if not victims or len(victims) > self.max_victims:
+                continue
+            mark = journal.mark()
+            for v in victims:
+                journal.release(v, self.bandwidth[v])
+            if (self.state.residual[cand] < bw).any():
+                journal.rollback(mark)
+                continue
+            journal.reserve(demand, cand.tolist(), bw)
+
+            ok = True
+            for v in self.rng.permutation(sorted(victims)).tolist():
+                path = self.route(v)
+                if path is None:
+                    ok = False
+                    break
+                journal.reserve(v, path, self.bandwidth[v])
+            if ok:
+                journal.commit()
+                return True
+            journal.rollback(mark)
+        return False
+
+    def swap(self, demand):
+        """Bước ngang: thay một demand chặn đường có bandwidth lớn hơn bằng demand này.
+
+        Số demand được chấp nhận không đổi nhưng giải phóng thêm capacity.
+        Trả về demand bị loại hoặc None.
+        """
+        bw = self.bandwidth[demand]
+        for cand in self.path_index.candidates(*self.pairs[demand]):
+            victims = self._victims(cand, bw)
+            if len(victims) != 1:
+                continue
+            (v,) = victims
+            if self.bandwidth[v] <= bw:
+                continue
+            mark = self.journal.mark()
+            self.journal.release(v, self.bandwidth[v])
+            if (self.state.residual[cand] < bw).any():
+                self.journal.rollback(mark)
+                continue
+            self.journal.reserve(demand, cand.tolist(), bw)
+            self.journal.commit()
+            return v
+        return None
+
+    def improve(self, rejected, deadline, patience=5):
+        """Lặp chèn lại các demand bị từ chối; khi kẹt thì thử một bước swap.
+
+        Dừng khi hết thời gian hoặc sau `patience` lượt liên tiếp không tăng số demand.
+        """
+        rejected = list(rejected)
+        stale = 0
+        while rejected and time.time() < deadline and stale < patience:
+            improved = False
+            for demand in self.rng.permutation(rejected).tolist():
+                if time.time() >= deadline:
+                    break
+                if self.try_insert(demand):
+                    rejected.remove(demand)
+                    improved = True
+            if improved:
+                stale = 0
+                continue
+            stale += 1
+            demand = rejected[self.rng.integers(len(rejected))]
+            dropped = self.swap(demand)
+            if dropped is not None:
+                rejected.remove(demand)
+                rejected.append(dropped)
+        return rejected
+
+    def score(self):
+        accepted = list(self.journal.routes)
+        return len(accepted), sum(self.bandwidth[d] for d in accepted)
+
+
+def perturbed_order(base_order, rng, noise):
+    """Xáo trộn nhẹ một thứ tự: mỗi vị trí dịch ngẫu nhiên quanh hạng ban đầu"""
+    keys = np.arange(len(base_order)) + rng.normal(0.0, noise * len(base_order) + 1e-9, len(base_order))
+    return np.asarray(base_order)[np.argsort(keys, kind='stable')]
+
+
+# 3. Multi-start: khởi đầu từ heuristic, sau đó thứ tự heuristic bị xáo trộn ngẫu nhiên
+def run_restarts(state, demands, hops, worker_id, seed, deadline, noise=0.05, max_victims=3):
+    rng = np.random.default_rng([seed, worker_id])
+    search = LocalSearch(state, demands, PathIndex(state), rng, max_victims)
+    best = {'count': -1}
+    restart = 0
+    # Luôn chạy ít nhất một lần construct (heuristic) kể cả khi đã hết giờ, ví dụ time_budget=0
+    # hoặc pool khởi động lâu hơn time_budget
+    while restart == 0 or time.time() < deadline:
+        heuristic = HEURISTIC_ORDERINGS[(worker_id + restart) % len(HEURISTIC_ORDERINGS)]
+        order = order_demands(demands, hops, heuristic)
+        if restart >= len(HEURISTIC_ORDERINGS):
+            order = perturbed_order(order, rng, noise)
+
+        rejected = search.construct(order.tolist())
+        initial = search.score()[0]
+        search.improve(rejected, deadline)
+        count, bandwidth = search.score()
+        if (count, -bandwidth) > (best['count'], -best.get('bandwidth', 0.0)):
+            best = {'count': count, 'bandwidth': bandwidth, 'start': heuristic, 'initial': initial,
+                    'routes': {d: list(e) for d, e in search.journal.routes.items()}}
+        restart += 1
+    best['restarts'] = restart
+    return best
+
+
+_WORKER = {}
+
+
+def _init_worker(spec, nodes):
+    arrays, blocks = attach_arrays(spec)
+    _WORKER['blocks'] = blocks
+    _WORKER['arrays'] = arrays
+    _WORKER['state'] = state_from_arrays(arrays, nodes)
+
+
+def _run_in_worker(args):
+    arrays = _WORKER['arrays']
+    return run_restarts(_WORKER['state'], arrays['demands'], arrays['hops'], *args)
+
+
+def optimise(state, demands, time_budget=10.0, workers=None, seed=0):
+    """Tìm thứ tự + đường đi tối đa hóa số demand được chấp nhận trong time_budget giây.
+
+    Trả về dict: count, bandwidth, restarts, accepted (list seq), routes {seq: list edge id}.
+    """
+    demands = np.asarray(demands, dtype=DEMAND_DTYPE) if not isinstance(demands, np.ndarray) else demands
+    hops = demand_hops(state, demands)
+    deadline = time.time() + time_budget
+    workers = workers or os.cpu_count()
+
+    if workers == 1:
+        local = state_from_arrays(topology_arrays(state), state.nodes)
+        results = [run_restarts(local, demands, hops, 0, seed, deadline)]
+    else:
+        arrays = dict(topology_arrays(state), demands=demands, hops=hops)
+        with SharedArrays(arrays) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.spec, state.nodes)) as pool:
+                results = list(pool.map(_run_in_worker, [(w, seed, deadline) for w in range(workers)]))
+
+    best = max(results, key=lambda r: (r['count'], -r.get('bandwidth', 0.0)))
+    seqs = demands['seq'].tolist()
+    return {'count': best['count'], 'bandwidth': best['bandwidth'], 'start': best['start'],
+            'initial': best['initial'], 'restarts': sum(r['restarts'] for r in results),
+            'accepted': sorted(seqs[d] for d in best['routes']),
+            'routes': {seqs[d]: eids for d, eids in best['routes'].items()}}
+
+
+# 4. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="Tối ưu số demands được chấp nhận (N_max)")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('demands', help="File demands CSV hoặc JSONL")
+    parser.add_argument('--budget', type=float, default=10.0, help="Thời gian tìm kiếm (giây)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from topology_cache import load_topology
+    state = load_topology(args.topology)
+    batches = list(iter_demand_batches(args.demands))
+    demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+
+    result = optimise(state, demands, args.budget, args.workers, args.seed)
+    print(f"N_max = {result['count']}/{len(demands)} demands "
+          f"(khởi đầu '{result['start']}': {result['initial']})")
+    print(f"Bandwidth accepted: {result['bandwidth']:.1f} Mbps")
+    print(f"Số lần restart: {result['restarts']}")
+
+
+if __name__ == "__main__":
+    main()
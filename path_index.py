@@ -0,0 +1,105 @@
+import os
+import numpy as np
+from ksp import yen_k_shortest_paths
+from topology_cache import cache_file, remove_stale
+
+
+# 1. Chỉ mục top-k đường ứng viên cho mỗi cặp node
+class PathIndex:
+    """Top-k đường đi ngắn nhất (theo distance, không giới hạn residual) cho từng cặp node.
+
+    Mỗi đường lưu dạng mảng edge id; cặp (s, t) và (t, s) dùng chung một mục.
+    Các cặp chưa có được tính lười bằng Yen và đánh dấu để ghi lại xuống đĩa.
+    """
+
+    def __init__(self, state, k=8, path=None):
+        self.state = state
+        self.k = k
+        self.path = path
+        self.pairs = {}
+        self.dirty = False
+
+    def _entry(self, source, target):
+        key = (source, target) if source <= target else (target, source)
+        entry = self.pairs.get(key)
+        if entry is None:
+            found = yen_k_shortest_paths(self.state, key[0], key[1], self.k)
+            entry = [np.asarray(eids, dtype=np.int32) for _, _, eids in found]
+            self.pairs[key] = entry
+            self.dirty = True
+        return entry if source <= target else [eids[::-1] for eids in entry]
+
+    def bind(self, state):
+        """Chỉ mục trên state khác cùng topology: dùng chung các đường ứng viên (không phụ thuộc
+        capacity), first_fit đọc residual của state mới"""
+        index = PathIndex(state, self.k, self.path)
+        index.pairs = self.pairs
+        return index
+
+    def candidates(self, source, target):
+        """Các đường ứng viên (mảng edge id) từ source đến target, ngắn nhất trước"""
+        return self._entry(source, target)
+
+    def first_fit(self, source, target, bandwidth):
+        """Đường ngắn nhất trong chỉ mục có residual >= bandwidth trên mọi link (None nếu không có).
+
+        Nếu có, đó cũng là đường ngắn nhất trên toàn residual graph; nếu không,
+        người gọi phải chạy lại Dijkstra vì đường khả thi có thể nằm ngoài top-k.
+        """
+        residual = self.state.residual
+        for eids in self._entry(source, target):
+            if not len(eids) or residual[eids].min() >= bandwidth:
+                return eids
+        return None
+
+    def build_all(self):
+        for s in range(self.state.num_nodes):
+            for t in range(s + 1, self.state.num_nodes):
+                self._entry(s, t)
+
+    # 2. Lưu / đọc dạng mảng phẳng: offsets theo cặp, offsets theo path, edge id nối liền
+    def save(self, path=None):
+        path = path or self.path
+        if path is None or not self.dirty:
+            return
+        keys = sorted(self.pairs)
+        pair_ptr, path_ptr, flat = [0], [0], []
+        for key in keys:
+            for eids in self.pairs[key]:
+                flat.append(eids)
+                path_ptr.append(path_ptr[-1] + len(eids))
+            pair_ptr.append(len(path_ptr) - 1)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, k=self.k, num_edges=self.state.num_edges,
+                 pairs=np.array(keys, dtype=np.int32).reshape(-1, 2),
+                 pair_ptr=np.array(pair_ptr, dtype=np.int64),
+                 path_ptr=np.array(path_ptr, dtype=np.int64),
+                 edge_ids=np.concatenate(flat) if flat else np.zeros(0, dtype=np.int32))
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, state, path, k=8):
+        index = cls(state, k, path)
+        if not os.path.exists(path):
+            return index
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['k']) != k or int(data['num_edges']) != state.num_edges:
+                return index
+            pairs, pair_ptr = data['pairs'].tolist(), data['pair_ptr']
+            path_ptr, edge_ids = data['path_ptr'], data['edge_ids']
+        for i, key in enumerate(pairs):
+            index.pairs[tuple(key)] = [edge_ids[path_ptr[p]:path_ptr[p + 1]]
+                                       for p in range(pair_ptr[i], pair_ptr[i + 1])]
+        return index
+
+
+# 3. Chỉ mục gắn với file GML, lưu cạnh cache topology
+def load_path_index(state, gml_path, k=8, cache_dir=None):
+    suffix = f'.paths{k}.npz'
+    path = cache_file(gml_path, suffix, cache_dir)
+    if os.path.isdir(os.path.dirname(path)):
+        remove_stale(path, suffix)
+    return PathIndex.load(state, path, k)
@@ -0,0 +1,234 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+import numpy as np
+
+# INFONET_HEADLESS=1: không mở cửa sổ, mọi hình được ghi ra file (PNG/SVG)
+if os.environ.get('INFONET_HEADLESS') == '1':
+    matplotlib.use('Agg')
+
+import matplotlib.patches as mpatches
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+NON_INTERACTIVE = {'agg', 'pdf', 'ps', 'svg', 'cairo', 'pgf', 'template'}
+CAPACITY_COLORS = {100: (0.2, 0.4, 0.8), 200: (0.4, 0.6, 0.2), 300: (0.8, 0.5, 0.2)}
+UTIL_COLORS = np.array([(0.0, 0.5, 0.0), (1.0, 0.65, 0.0), (1.0, 0.0, 0.0)])  # green, orange, red
+
+
+# 1. Chế độ headless: ghi hình ra file thay cho plt.show()
+def is_headless():
+    return os.environ.get('INFONET_HEADLESS') == '1' or matplotlib.get_backend().lower() in NON_INTERACTIVE
+
+
+def finish(fig, name, out_dir=None, formats=None):
+    """Hiện hình (chế độ tương tác) hoặc ghi <out_dir>/<name>.<fmt> rồi đóng hình (headless).
+
+    out_dir mặc định lấy từ INFONET_FIGURE_DIR (hoặc thư mục hiện tại),
+    formats từ INFONET_FIGURE_FORMATS (ví dụ "png,svg").
+    """
+    if not is_headless() and out_dir is None:
+        plt.show()
+        return []
+    out_dir = out_dir or os.environ.get('INFONET_FIGURE_DIR', '.')
+    formats = formats or os.environ.get('INFONET_FIGURE_FORMATS', 'png').split(',')
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"{name}.{fmt.strip()}")
+        fig.savefig(path, dpi=100)
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+# 2. Ảnh chụp trạng thái (chỉ các mảng cần để vẽ, gửi được sang process khác)
+def snapshot(state):
+    return {'nodes': list(state.nodes), 'longitude': state.longitude, 'latitude': state.latitude,
+            'src': state.src, 'dst': state.dst, 'capacity': state.capacity, 'flow': state.flow.copy()}
+
+
+def utilization(snap):
+    util = np.zeros(len(snap['capacity']))
+    np.divide(snap['flow'], snap['capacity'], out=util, where=snap['capacity'] > 0)
+    return util
+
+
+def utilization_colors(util):
+    """Đỏ > 70%, cam > 30%, xanh lá còn lại"""
+    return UTIL_COLORS[np.searchsorted([0.3, 0.7], util, side='left')]
+
+
+def capacity_colors(capacity, util):
+    """Màu theo bậc capacity, làm tối theo utilization"""
+    base = np.array([CAPACITY_COLORS.get(int(c), CAPACITY_COLORS[300]) for c in capacity.tolist()])
+    return base * (1 - util * 0.5)[:, None]
+
+
+# 3. Vẽ vector hóa: mọi link là một LineCollection, mọi node là một scatter
+def draw_links(ax, snap, mask=None, colors='gray', widths=1.0, style='solid', alpha=1.0):
+    src, dst = snap['src'], snap['dst']
+    if mask is not None:
+        src, dst = src[mask], dst[mask]
+        colors = colors[mask] if isinstance(colors, np.ndarray) else colors
+        widths = widths[mask] if isinstance(widths, np.ndarray) else widths
+    xy = np.column_stack([snap['longitude'], snap['latitude']])
+    segments = np.stack([xy[src], xy[dst]], axis=1)
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=widths, linestyles=style,
+                                     alpha=alpha, zorder=1))
+
+
+def draw_nodes(ax, snap, color='lightblue', size=500, labels=True, font_size=8, alpha=1.0):
+    ax.scatter(snap['longitude'], snap['latitude'], s=size, c=color, alpha=alpha, zorder=2)
+    if labels:
+        for node, x, y in zip(snap['nodes'], snap['longitude'].tolist(), snap['latitude'].tolist()):
+            ax.text(x, y, str(node), fontsize=font_size, fontweight='bold', ha='center', va='center', zorder=3)
+    ax.autoscale_view()
+    ax.set_axis_off()
+
+
+# 4. Các hình của từng phương pháp (nhận snapshot, trả về Figure)
+def utilization_figure(snap, title):
+    """Hình của test2.py / FCFS: màu link theo mức utilization"""
+    fig, ax = plt.subplots(figsize=(12, 8))
+    draw_links(ax, snap, colors=utilization_colors(utilization(snap)), widths=2.0)
+    draw_nodes(ax, snap, color='skyblue', size=400)
+    ax.legend(handles=[mpatches.Patch(color='red', label='Utilization > 70%'),
+                       mpatches.Patch(color='orange', label='30% - 70%'),
+                       mpatches.Patch(color='green', label='Utilization < 30%')],
+              loc='upper right', title="Trạng thái tải")
+    ax.set_title(title)
+    return fig
+
+
+def nmax_figure(snap, util_dist, title):
+    """Hình của Nmax.py: mạng tô theo capacity/utilization và biểu đồ phân bố utilization"""
+    util = utilization(snap)
+    fig, (ax_net, ax_bar) = plt.subplots(1, 2, figsize=(14, 6))
+    draw_links(ax_net, snap, colors=capacity_colors(snap['capacity'], util), widths=1 + util * 4, alpha=0.7)
+    draw_nodes(ax_net, snap, color='lightgray', size=80, labels=False, alpha=0.9)
+    ax_net.legend(handles=[mpatches.Patch(color=color, label=f'{cap} Mbps') for cap, color in CAPACITY_COLORS.items()],
+                  loc='upper right', fontsize=8)
+    ax_net.set_title(title, fontsize=10)
+
+    ranges, counts = list(util_dist.keys()), list(util_dist.values())
+    ax_bar.bar(ranges, counts, color=['green', 'orange', 'red'], alpha=0.8)
+    ax_bar.set_title('Phân bố Utilization của Links', fontsize=12)
+    ax_bar.set_ylabel('Số links')
+    ax_bar.set_xlabel('Mức độ utilization')
+    for i, count in enumerate(counts):
+        ax_bar.text(i, count + 0.5, str(count), ha='center', va='bottom')
+    fig.tight_layout()
+    return fig
+
+
+def mst_figure(snap, mst_mask, total_distance):
+    """Hình của MST.py: mạng gốc, MST, và kết hợp (MST nét liền, còn lại nét đứt)"""
+    fig, axes = plt.subplots(1, 3, figsize=(16, 6))
+    draw_links(axes[0], snap, colors='black')
+    draw_nodes(axes[0], snap)
+    axes[0].set_title("AT&T Backbone Network (Original)\nAll edges")
+
+    draw_links(axes[1], snap, mask=mst_mask, colors='red')
+    draw_nodes(axes[1], snap, color='lightgreen')
+    axes[1].set_title(f"MST (Prim Algorithm)\nTotal distance: {total_distance:.2f} km")
+
+    draw_links(axes[2], snap, mask=~mst_mask, colors='gray', style='dashed')
+    draw_links(axes[2], snap, mask=mst_mask, colors='red', widths=2.0)
+    draw_nodes(axes[2], snap)
+    axes[2].set_title(f"AT&T Network with MST (Prim)\nSolid: MST edges,\n Dashed: Non-MST edges\n"
+                      f"Total MST distance: {total_distance:.2f} km")
+    fig.tight_layout()
+    return fig
+
+
+FIGURES = {'utilization': utilization_figure, 'nmax': nmax_figure, 'mst': mst_figure}
+
+
+# 5. Vẽ song song nhiều hình trong các worker process (backend Agg)
+def _init_worker():
+    # Chỉ trong worker process: không đổi backend của process cha khi vẽ tuần tự (workers == 1)
+    matplotlib.use('Agg', force=True)
+
+
+def _render_job(job):
+    kind, name, out_dir, formats, args = job
+    return finish(FIGURES[kind](*args), name, out_dir, formats)
+
+
+def render_jobs(jobs, out_dir, formats=('png',), workers=None):
+    """jobs: list (kind, name, args) với kind thuộc FIGURES; trả về list đường dẫn file đã ghi"""
+    tasks = [(kind, name, out_dir, list(formats), args) for kind, name, args in jobs]
+    if workers == 1 or len(tasks) <= 1:
+        return [path for task in tasks for path in _render_job(task)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return [path for paths in pool.map(_render_job, tasks) for path in paths]
+
+
+def scenario_jobs(state, demands, name):
+    """Chạy FCFS, Small-Bandwidth-First (load-aware), Nmax multipath và MST trên một tập demands"""
+    from link_stats import LinkStats
+    from path_index import PathIndex
+    from spanning_tree import prim_mst
+    from strategy_runner import demand_hops, make_policy, order_demands
+
+    hops = demand_hops(state, demands)
+    jobs = []
+    for figure, policy, ordering in (('fcfs', 'shortest', 'arrival'), ('test2', 'load_aware', 'bandwidth'),
+                                     ('nmax', 'multipath', 'bandwidth_hops')):
+        state.reset()
+        attached = len(state.observers)
+        try:
+            stats = state.attach(LinkStats(state))
+            admit = make_policy(policy, state, PathIndex(state))
+            accepted = 0
+            for i in order_demands(demands, hops, ordering).tolist():
+                seq, source, target, bandwidth = demands[i].tolist()
+                if source in state.node_index and target in state.node_index:
+                    accepted += bool(admit(seq, source, target, bandwidth))
+        finally:
+            # Bỏ các observer của lần chạy này (LinkStats, router), kể cả khi policy lỗi
+            for observer in state.observers[attached:]:
+                state.detach(observer)
+        snap = snapshot(state)
+        if figure == 'nmax':
+            title = (f"Network với Smart Multi-path Routing\nAccepted: {accepted}/{len(demands)} demands\n"
+                     f"Avg util: {stats.average() * 100:.1f}%")
+            jobs.append(('nmax', f"{name}_{figure}", (snap, stats.distribution(), title)))
+        else:
+            jobs.append(('utilization', f"{name}_{figure}", (snap, f"{figure} - N = {accepted}/{len(demands)}")))
+
+    state.reset()
+    eids, total = prim_mst(state)
+    mask = np.zeros(state.num_edges, dtype=bool)
+    mask[eids] = True
+    jobs.append(('mst', f"{name}_mst", (snapshot(state), mask, total)))
+    return jobs
+
+
+# 6. Chạy từ dòng lệnh: mỗi file demands là một kịch bản, mọi hình được vẽ song song
+def main():
+    parser = argparse.ArgumentParser(description="Vẽ hình headless cho nhiều kịch bản song song")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('demands', nargs='+', help="Các file demands CSV/JSONL (mỗi file một kịch bản)")
+    parser.add_argument('--out', default='figures')
+    parser.add_argument('--formats', default='png', help="Ví dụ png,svg")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    from demand_stream import DEMAND_DTYPE, iter_demand_batches
+    from topology_cache import load_topology
+    state = load_topology(args.topology)
+    jobs = []
+    for path in args.demands:
+        batches = list(iter_demand_batches(path))
+        demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+        jobs.extend(scenario_jobs(state, demands, os.path.splitext(os.path.basename(path))[0]))
+
+    paths = render_jobs(jobs, args.out, args.formats.split(','), args.workers)
+    print(f"Đã ghi {len(paths)} file hình vào {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from demand_stream import DEMAND_DTYPE
+
+# Định dạng ghi: npy (thư mục .npy, mmap được), npz (một file), arrow (Arrow IPC, mmap được), parquet
+FORMATS = ('npy', 'npz', 'arrow', 'parquet')
+STATUS_REJECTED, STATUS_ACCEPTED, STATUS_PARTIAL = 0, 1, 2
+STATUS_NAMES = ('rejected', 'accepted', 'partial')
+
+DEMAND_COLUMNS = ('seq', 'source', 'target', 'bandwidth', 'allocated', 'status', 'reason')
+PATH_COLUMNS = ('path_ptr', 'path_bandwidth', 'edge_ptr', 'path_edges')
+LINK_COLUMNS = ('link_source', 'link_target', 'link_capacity', 'link_distance', 'link_flow')
+
+
+# 1. Gom kết quả từ NetworkState thành các cột (path dạng offsets + mảng edge id phẳng)
+def result_columns(state, demands, reasons=None):
+    """Các cột kết quả và danh sách lý do từ chối.
+
+    demands: mảng DEMAND_DTYPE hoặc list (seq, source, target, bandwidth), giữ nguyên thứ tự.
+    Demand được chấp nhận là demand có bản ghi trong state.reservations; path thứ j của demand i
+    là path_edges[edge_ptr[p]:edge_ptr[p + 1]] với p = path_ptr[i] + j, bandwidth path_bandwidth[p].
+    reasons: dict seq -> lý do (chuỗi) cho các demand bị từ chối.
+    """
+    demands = np.asarray(demands, dtype=DEMAND_DTYPE) if not isinstance(demands, np.ndarray) else demands
+    n = len(demands)
+    reasons = reasons or {}
+    reason_names = sorted(set(reasons.values()))
+    reason_code = {name: i for i, name in enumerate(reason_names)}
+
+    allocated = np.zeros(n, dtype=np.float64)
+    reason = np.full(n, -1, dtype=np.int16)
+    path_ptr = np.zeros(n + 1, dtype=np.int64)
+    path_bandwidth, path_lengths, path_arrays = [], [], []
+    for i, seq in enumerate(demands['seq'].tolist()):
+        records = state.reservations.get(seq, ())
+        for eids, bandwidth in records:
+            path_arrays.append(eids)
+            path_lengths.append(len(eids))
+            path_bandwidth.append(bandwidth)
+            allocated[i] += bandwidth
+        path_ptr[i + 1] = path_ptr[i] + len(records)
+        if seq in reasons:
+            reason[i] = reason_code[reasons[seq]]
+
+    edge_ptr = np.zeros(len(path_lengths) + 1, dtype=np.int64)
+    np.cumsum(path_lengths, out=edge_ptr[1:])
+    path_edges = (np.concatenate(path_arrays).astype(np.int32) if path_arrays
+                  else np.zeros(0, dtype=np.int32))
+
+    status = np.full(n, STATUS_REJECTED, dtype=np.int8)
+    status[allocated > 0] = STATUS_PARTIAL
+    status[(allocated > 0) & (allocated >= demands['bandwidth'] - 1e-9)] = STATUS_ACCEPTED
+
+    labels = np.asarray(state.nodes)
+    columns = {
+        'seq': demands['seq'], 'source': demands['source'], 'target': demands['target'],
+        'bandwidth': demands['bandwidth'], 'allocated': allocated, 'status': status, 'reason': reason,
+        'path_ptr': path_ptr, 'path_bandwidth': np.asarray(path_bandwidth, dtype=np.float64),
+        'edge_ptr': edge_ptr, 'path_edges': path_edges,
+        'link_source': labels[state.src], 'link_target': labels[state.dst],
+        'link_capacity': state.capacity, 'link_distance': state.distance, 'link_flow': state.flow.copy(),
+    }
+    return columns, reason_names
+
+
+def run_metadata(columns, reason_names, metadata=None):
+    status = columns['status']
+    meta = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'num_demands': len(status), 'num_links': len(columns['link_flow']),
+            'accepted': int(np.count_nonzero(status == STATUS_ACCEPTED)),
+            'partial': int(np.count_nonzero(status == STATUS_PARTIAL)),
+            'rejected': int(np.count_nonzero(status == STATUS_REJECTED)),
+            'demand_bandwidth': float(columns['bandwidth'].sum()),
+            'allocated_bandwidth': float(columns['allocated'].sum()),
+            'status_names': list(STATUS_NAMES), 'reasons': reason_names}
+    meta.update(metadata or {})
+    return meta
+
+
+# 2. Ghi theo từng định dạng
+def _write_npy(path, columns, meta):
+    os.makedirs(path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+    with open(os.path.join(path, 'metadata.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def _write_npz(path, columns, meta):
+    np.savez(path, __metadata__=np.array(json.dumps(meta, ensure_ascii=False)), **columns)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Định dạng arrow/parquet cần pyarrow (pip install pyarrow), "
+                          "hoặc dùng fmt='npy'/'npz'") from None
+    return pyarrow
+
+
+def _arrow_tables(pa, columns):
+    """Bảng demands (path là list<list<int32>> dùng lại đúng offsets) và bảng links"""
+    edges = pa.ListArray.from_arrays(pa.array(columns['edge_ptr'].astype(np.int32)),
+                                     pa.array(columns['path_edges']))
+    path_ptr = pa.array(columns['path_ptr'].astype(np.int32))
+    demands = pa.table({name: columns[name] for name in DEMAND_COLUMNS} | {
+        'paths': pa.ListArray.from_arrays(path_ptr, edges),
+        'path_bandwidth': pa.ListArray.from_arrays(path_ptr, pa.array(columns['path_bandwidth']))})
+    links = pa.table({name[len('link_'):]: columns[name] for name in LINK_COLUMNS})
+    return demands, links
+
+
+def _write_arrow(path, columns, meta, parquet=False):
+    pa = _require_pyarrow()
+    os.makedirs(path, exist_ok=True)
+    for name, table in zip(('demands', 'links'), _arrow_tables(pa, columns)):
+        if parquet:
+            import pyarrow.parquet as pq
+            pq.write_table(table, os.path.join(path, f"{name}.parquet"))
+        else:
+            with pa.OSFile(os.path.join(path, f"{name}.arrow"), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    with open(os.path.join(path, 'metadata.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def write_results(path, state, demands, reasons=None, metadata=None, fmt=None):
+    """Ghi kết quả một lần chạy ở dạng cột, trả về đường dẫn đã ghi.
+
+    fmt mặc định lấy từ INFONET_RESULT_FORMAT (npy nếu không đặt). npz thêm đuôi .npz vào path,
+    các định dạng còn lại ghi vào thư mục path. metadata: dict thêm vào metadata.json.
+    """
+    fmt = fmt or os.environ.get('INFONET_RESULT_FORMAT', 'npy')
+    if fmt not in FORMATS:
+        raise ValueError(f"Không có định dạng '{fmt}', chọn một trong {FORMATS}")
+    columns, reason_names = result_columns(state, demands, reasons)
+    meta = run_metadata(columns, reason_names, metadata)
+    meta['format'] = fmt
+    if fmt == 'npz':
+        path = path if path.endswith('.npz') else path + '.npz'
+        _write_npz(path, columns, meta)
+    elif fmt == 'npy':
+        _write_npy(path, columns, meta)
+    else:
+        _write_arrow(path, columns, meta, parquet=(fmt == 'parquet'))
+    return path
+
+
+# 3. Đọc lại: npy/arrow được memory-map (không nạp cả file vào bộ nhớ)
+def _arrow_columns(demands, links):
+    columns = {name: demands.column(name).to_numpy() for name in DEMAND_COLUMNS}
+    paths = demands.column('paths').combine_chunks()
+    edges = paths.values
+    columns['path_ptr'] = paths.offsets.to_numpy().astype(np.int64)
+    columns['path_bandwidth'] = demands.column('path_bandwidth').combine_chunks().values.to_numpy()
+    columns['edge_ptr'] = edges.offsets.to_numpy().astype(np.int64)
+    columns['path_edges'] = edges.values.to_numpy()
+    columns.update({name: links.column(name[len('link_'):]).to_numpy() for name in LINK_COLUMNS})
+    return columns
+
+
+def load_results(path, mmap=True):
+    """Trả về (dict tên cột -> mảng NumPy, metadata)"""
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files}
+        return columns, json.loads(str(columns.pop('__metadata__')))
+
+    with open(os.path.join(path, 'metadata.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta['format'] == 'npy':
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                   for name in DEMAND_COLUMNS + PATH_COLUMNS + LINK_COLUMNS}
+        return columns, meta
+
+    pa = _require_pyarrow()
+    tables = []
+    for name in ('demands', 'links'):
+        if meta['format'] == 'parquet':
+            import pyarrow.parquet as pq
+            tables.append(pq.read_table(os.path.join(path, f"{name}.parquet"), memory_map=mmap))
+        else:
+            source = (pa.memory_map if mmap else pa.OSFile)(os.path.join(path, f"{name}.arrow"), 'r')
+            tables.append(pa.ipc.open_file(source).read_all())
+    return _arrow_columns(*tables), meta
+
+
+def demand_paths(columns, i):
+    """Các path của demand thứ i: list (mảng edge id, bandwidth)"""
+    edge_ptr, path_edges = columns['edge_ptr'], columns['path_edges']
+    return [(path_edges[edge_ptr[p]:edge_ptr[p + 1]], float(columns['path_bandwidth'][p]))
+            for p in range(int(columns['path_ptr'][i]), int(columns['path_ptr'][i + 1]))]
+
+
+# 4. Chạy từ dòng lệnh: tóm tắt một file/thư mục kết quả
+def main():
+    parser = argparse.ArgumentParser(description="Tóm tắt kết quả dạng cột (npy/npz/arrow/parquet)")
+    parser.add_argument('path')
+    parser.add_argument('--show', type=int, default=10, help="Số demand đầu tiên in ra")
+    args = parser.parse_args()
+
+    columns, meta = load_results(args.path)
+    print(f"Định dạng: {meta['format']}, {meta['num_demands']} demands, {meta['num_links']} links")
+    print(f"Accepted: {meta['accepted']}, partial: {meta['partial']}, rejected: {meta['rejected']}")
+    print(f"Bandwidth: {meta['allocated_bandwidth']:.1f}/{meta['demand_bandwidth']:.1f} Mbps")
+    print(f"{'Seq':<6} {'Source':<8} {'Target':<8} {'BW':<8} {'Trạng thái':<10} {'Paths'}")
+    for i in range(min(args.show, meta['num_demands'])):
+        paths = [e.tolist() for e, _ in demand_paths(columns, i)]
+        print(f"{int(columns['seq'][i]):<6} {int(columns['source'][i]):<8} {int(columns['target'][i]):<8} "
+              f"{float(columns['bandwidth'][i]):<8.1f} {STATUS_NAMES[columns['status'][i]]:<10} {paths}")
+
+
+if __name__ == "__main__":
+    main()
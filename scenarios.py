@@ -0,0 +1,176 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
+
+from demand_stream import DEMAND_DTYPE, iter_demand_batches
+from geo import CAPACITY_BOUNDS, CAPACITY_TIERS, capacity_tiers
+from network_state import NetworkState
+from path_index import PathIndex
+from strategy_runner import DEFAULT_CONFIGS, POLICIES, SharedArrays, attach_arrays, demand_hops, run_config
+
+# Kế hoạch capacity theo bậc khoảng cách: bậc của cả 4 script và bậc đã nâng cấp
+CAPACITY_PLANS = {'distance': CAPACITY_TIERS, 'upgraded': (200, 400, 600)}
+TOPOLOGY_ARRAYS = ('src', 'dst', 'distance', 'indptr', 'indices', 'edge_ids')
+
+
+# 1. Topology bất biến dùng chung: adjacency CSR, distance, tọa độ (mảng chỉ đọc)
+class Topology:
+    """Phần không đổi giữa các kịch bản. Mỗi kịch bản chỉ thêm mảng capacity và tập link hỏng;
+    state() tạo NetworkState dùng chung CSR và adjacency list, riêng capacity/flow/residual."""
+
+    def __init__(self, nodes, src, dst, distance, indptr, indices, edge_ids, latitude=None, longitude=None):
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.src, self.dst, self.distance = _frozen(src, np.int32), _frozen(dst, np.int32), _frozen(distance)
+        self.indptr, self.indices = _frozen(indptr, np.int64), _frozen(indices, np.int32)
+        self.edge_ids = _frozen(edge_ids, np.int32)
+        self.latitude = None if latitude is None else _frozen(latitude)
+        self.longitude = None if longitude is None else _frozen(longitude)
+        self.adjacency = (self.indptr.tolist(), self.indices.tolist(),
+                          self.edge_ids.tolist(), self.distance.tolist())
+        self.path_index = None
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.nodes, state.src, state.dst, state.distance, state.indptr, state.indices,
+                   state.edge_ids, state.latitude, state.longitude)
+
+    @classmethod
+    def load(cls, gml_path):
+        from topology_cache import load_topology
+        return cls.from_state(load_topology(gml_path))
+
+    @classmethod
+    def from_arrays(cls, arrays, nodes):
+        return cls(nodes, *(arrays[name] for name in TOPOLOGY_ARRAYS))
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in TOPOLOGY_ARRAYS}
+
+    @property
+    def num_edges(self):
+        return len(self.src)
+
+    def capacity(self, tiers=CAPACITY_TIERS, bounds=CAPACITY_BOUNDS):
+        """Capacity theo bậc khoảng cách (mặc định 100/200/300 Mbps như các script)"""
+        return capacity_tiers(self.distance, bounds, tiers)
+
+    def state(self, capacity, failed=()):
+        """NetworkState của một kịch bản; failed: list edge id hoặc mask bool, các link này có capacity 0"""
+        capacity = np.array(capacity, dtype=np.float64)
+        failed = np.asarray(failed)
+        capacity[failed if failed.dtype == bool else failed.astype(np.intp)] = 0.0
+        return NetworkState(self.nodes, self.src, self.dst, self.distance, capacity, self.latitude, self.longitude,
+                            csr=(self.indptr, self.indices, self.edge_ids), adjacency=self.adjacency)
+
+    def index(self, state, k=8):
+        """PathIndex gắn với state: đường ứng viên (không phụ thuộc capacity) tính một lần cho mọi kịch bản"""
+        if self.path_index is None:
+            self.path_index = PathIndex(state, k)
+        return self.path_index.bind(state)
+
+
+def _frozen(arr, dtype=np.float64):
+    arr = np.asarray(arr, dtype=dtype).view()
+    arr.flags.writeable = False
+    return arr
+
+
+# 2. Danh sách kịch bản: kế hoạch capacity x (không hỏng, hỏng 1 link, hỏng 2 link)
+def make_scenarios(topology, plans=CAPACITY_PLANS, failures=0):
+    """Trả về (dict tên kế hoạch -> mảng capacity, list kịch bản {'name', 'plan', 'failed'})"""
+    capacities = {name: topology.capacity(tiers) for name, tiers in plans.items()}
+    scenarios = []
+    for plan in plans:
+        for n in range(failures + 1):
+            for failed in combinations(range(topology.num_edges), n):
+                label = '+'.join(f"{topology.nodes[topology.src[e]]}-{topology.nodes[topology.dst[e]]}"
+                                 for e in failed)
+                scenarios.append({'name': f"{plan}/{label}" if failed else plan, 'plan': plan, 'failed': failed})
+    return capacities, scenarios
+
+
+def run_scenario(topology, capacities, scenario, demands, hops, config):
+    state = topology.state(capacities[scenario['plan']], scenario['failed'])
+    row = run_config(state, demands, hops, *config, path_index=topology.index(state))
+    row.update(scenario=scenario['name'], plan=scenario['plan'], failed=len(scenario['failed']))
+    return row
+
+
+# 3. Worker: gắn topology, capacity các kế hoạch và demands từ shared memory một lần
+_WORKER = {}
+
+
+def _init_worker(spec, nodes, plans):
+    arrays, blocks = attach_arrays(spec)
+    _WORKER['blocks'] = blocks
+    _WORKER['arrays'] = arrays
+    _WORKER['topology'] = Topology.from_arrays(arrays, nodes)
+    _WORKER['capacities'] = {plan: arrays[f"capacity:{plan}"] for plan in plans}
+
+
+def _run_in_worker(task):
+    scenario, config = task
+    arrays = _WORKER['arrays']
+    return run_scenario(_WORKER['topology'], _WORKER['capacities'], scenario, arrays['demands'], arrays['hops'],
+                        config)
+
+
+def run_scenarios(topology, capacities, scenarios, demands, configs=DEFAULT_CONFIGS, workers=None):
+    """Chạy mọi (kịch bản, cấu hình); trả về list dòng kết quả của run_config thêm scenario/plan/failed"""
+    demands = np.asarray(demands, dtype=DEMAND_DTYPE) if not isinstance(demands, np.ndarray) else demands
+    # Số hop theo distance không phụ thuộc capacity nên tính một lần cho mọi kịch bản
+    hops = demand_hops(topology.state(next(iter(capacities.values()))), demands)
+    tasks = [(scenario, config) for scenario in scenarios for config in configs]
+
+    if workers == 1 or len(tasks) <= 1:
+        return [run_scenario(topology, capacities, scenario, demands, hops, config) for scenario, config in tasks]
+
+    workers = workers or os.cpu_count()
+    arrays = dict(topology.arrays(), demands=demands, hops=hops)
+    arrays.update({f"capacity:{plan}": capacity for plan, capacity in capacities.items()})
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.spec, topology.nodes, list(capacities))) as pool:
+            # Gom nhiều kịch bản vào một task: hàng trăm kịch bản nhỏ không tốn IPC cho từng cái
+            return list(pool.map(_run_in_worker, tasks, chunksize=max(len(tasks) // (4 * workers), 1)))
+
+
+def format_table(rows):
+    width = max([len('Scenario')] + [len(r['scenario']) for r in rows])
+    header = (f"{'Scenario':<{width}} {'Policy':<14} {'Ordering':<16} {'Accepted':>10} {'BW (Mbps)':>11} "
+              f"{'Avg util':>9} {'>70%':>5} {'Time (s)':>9}")
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(f"{r['scenario']:<{width}} {r['policy']:<14} {r['ordering']:<16} {r['accepted']:>5}/{r['demands']:<4} "
+                     f"{r['accepted_bw']:>11.1f} {r['avg_util']:>8.1f}% {r['links_over_70']:>5} {r['seconds']:>9.2f}")
+    return "\n".join(lines)
+
+
+# 4. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="Chạy một tập demands trên nhiều kế hoạch capacity / link hỏng")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('demands', help="File demands CSV hoặc JSONL")
+    parser.add_argument('--plans', nargs='+', default=list(CAPACITY_PLANS), choices=list(CAPACITY_PLANS))
+    parser.add_argument('--failures', type=int, default=0, choices=(0, 1, 2),
+                        help="Thêm các kịch bản hỏng tối đa N link")
+    parser.add_argument('--policies', nargs='+', default=['shortest'], choices=POLICIES)
+    parser.add_argument('--orderings', nargs='+', default=['arrival'])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    topology = Topology.load(args.topology)
+    batches = list(iter_demand_batches(args.demands))
+    demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+
+    capacities, scenarios = make_scenarios(topology, {plan: CAPACITY_PLANS[plan] for plan in args.plans},
+                                           args.failures)
+    configs = [(p, o) for p in args.policies for o in args.orderings]
+    print(format_table(run_scenarios(topology, capacities, scenarios, demands, configs, args.workers)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import math
+import time
+import numpy as np
+
+from admission import LINK_COSTS, LoadAwareRouter, residual_shortest_path
+from demand_stream import DEMAND_DTYPE, iter_demand_batches
+from network_state import DepartureSchedule
+from path_index import PathIndex
+
+POLICIES = ('fcfs', 'load_aware')
+BLOCK = 65536
+
+
+# 1. Chính sách định tuyến cho mô phỏng: admit theo chỉ số node, teardown theo seq
+def make_policy(name, state, path_index, cost='linear'):
+    """Trả về (admit(seq, s, t, bandwidth) -> bool, teardown(seq))"""
+    if name == 'fcfs':
+        # Giống AdmissionEngine nhưng không duy trì ResidualIndex (chi phí cập nhật lớn hơn lợi ích
+        # khi mỗi arrival đều có departure đi kèm)
+        def admit(seq, s, t, bandwidth):
+            eids = path_index.first_fit(s, t, bandwidth)
+            if eids is None:
+                found = residual_shortest_path(state, s, t, bandwidth)
+                if found is None:
+                    return False
+                eids = found[1]
+            state.reserve(eids, bandwidth, seq)
+            return True
+
+        return admit, state.teardown
+
+    if name == 'load_aware':
+        router = LoadAwareRouter(state, cost, path_index)
+
+        def admit(seq, s, t, bandwidth):
+            found = router.route(s, t, bandwidth)
+            if found is None:
+                return False
+            state.reserve(found[1], bandwidth, seq)
+            return True
+
+        return admit, state.teardown
+
+    raise ValueError(f"Không có policy '{name}', chọn một trong {POLICIES}")
+
+
+# 2. Sinh arrival theo block NumPy: thời điểm, cặp node, bandwidth, holding time
+def arrival_blocks(state, rng, arrival_rate, mean_holding, demands=None, trace=False,
+                   arrival_times=None, holding_trace=None):
+    """Sinh các block (time, s, t, bandwidth, holding), mỗi block tối đa BLOCK arrivals.
+
+    demands: mảng DEMAND_DTYPE làm nguồn cặp node/bandwidth (trace=True: phát lại đúng thứ tự,
+    lặp vòng; ngược lại lấy mẫu ngẫu nhiên). Không có demands: cặp node ngẫu nhiên, bandwidth U[1, 10].
+    arrival_times / holding_trace: mảng thời điểm đến / holding time lấy từ trace thay cho Poisson / mũ;
+    arrival_times phải không giảm (đồng hồ mô phỏng không được lùi so với lịch departure).
+    """
+    if arrival_times is not None and np.any(np.diff(np.asarray(arrival_times, dtype=np.float64)) < 0):
+        raise ValueError("arrival_times của trace phải được sắp xếp tăng dần theo thời gian")
+    if demands is not None:
+        keep = np.array([s in state.node_index and t in state.node_index and s != t
+                         for s, t in zip(demands['source'].tolist(), demands['target'].tolist())], dtype=bool)
+        demands = demands[keep]
+        src = np.array([state.node_index[n] for n in demands['source'].tolist()], dtype=np.int64)
+        dst = np.array([state.node_index[n] for n in demands['target'].tolist()], dtype=np.int64)
+        if not len(demands):
+            raise ValueError("Không có demand hợp lệ trong trace")
+
+    clock = 0.0
+    offset = 0
+    while True:
+        if arrival_times is not None:
+            times = np.asarray(arrival_times[offset:offset + BLOCK], dtype=np.float64)
+            if not len(times):
+                return
+        else:
+            times = clock + np.cumsum(rng.exponential(1.0 / arrival_rate, BLOCK))
+            clock = float(times[-1])
+        n = len(times)
+
+        if demands is None:
+            s = rng.integers(0, state.num_nodes, n)
+            t = (s + rng.integers(1, state.num_nodes, n)) % state.num_nodes
+            bandwidth = rng.uniform(1.0, 10.0, n)
+        else:
+            pick = (np.arange(offset, offset + n) % len(demands)) if trace else rng.integers(0, len(demands), n)
+            s, t, bandwidth = src[pick], dst[pick], demands['bandwidth'][pick]
+
+        if holding_trace is not None:
+            holding = np.asarray(holding_trace, dtype=np.float64)[np.arange(offset, offset + n) % len(holding_trace)]
+        else:
+            holding = rng.exponential(mean_holding, n)
+        yield times.tolist(), s.tolist(), t.tolist(), bandwidth.tolist(), holding.tolist()
+        offset += n
+
+
+# 3. Vòng lặp sự kiện: arrival theo thứ tự thời gian, departure qua heap của DepartureSchedule
+def simulate(state, policy='fcfs', arrival_rate=10.0, mean_holding=1.0, num_arrivals=100000,
+             demands=None, trace=False, arrival_times=None, holding_trace=None,
+             sample_interval=None, warmup=0.0, seed=0, path_index=None, cost='linear'):
+    """Mô phỏng sự kiện rời rạc trên NetworkState (state được reset).
+
+    Trả về dict: arrivals, blocked, blocking_probability, bandwidth_blocking, throughput (demand
+    được chấp nhận / đơn vị thời gian), carried_load (tổng bandwidth x holding / thời gian, Mbps),
+    link_utilization (trung bình theo thời gian), samples (times, util), events, seconds.
+    """
+    state.reset()
+    path_index = path_index or PathIndex(state)
+    admit, teardown = make_policy(policy, state, path_index, cost)
+    departures = DepartureSchedule(state, teardown)
+    rng = np.random.default_rng(seed)
+    if demands is not None and not isinstance(demands, np.ndarray):
+        demands = np.asarray(demands, dtype=DEMAND_DTYPE)
+
+    flow = state.flow
+    area = np.zeros(state.num_edges)
+    last = warmup
+    next_sample = warmup if sample_interval else math.inf
+    sample_times, samples = [], []
+    arrivals = blocked = 0
+    offered_bw = blocked_bw = carried = 0.0
+    events = 0
+    seq = 0
+    now = 0.0
+
+    start = time.perf_counter()
+    blocks = arrival_blocks(state, rng, arrival_rate, mean_holding, demands, trace, arrival_times, holding_trace)
+    for times, sources, targets, bandwidths, holdings in blocks:
+        for now, s, t, bw, hold in zip(times, sources, targets, bandwidths, holdings):
+            if seq >= num_arrivals:
+                break
+            # Departure xảy ra trước arrival này
+            while departures.next_departure() <= now:
+                dep_time = departures.next_departure()
+                if dep_time > last:
+                    area += flow * (dep_time - last)
+                    last = dep_time
+                events += len(departures.advance(dep_time))
+            while next_sample <= now:
+                sample_times.append(next_sample)
+                samples.append((flow / state.capacity).astype(np.float32))
+                next_sample += sample_interval
+            if now > last:
+                area += flow * (now - last)
+                last = now
+
+            events += 1
+            measured = now >= warmup
+            if admit(seq, s, t, bw):
+                departures.hold(seq, now + hold)
+                if measured:
+                    carried += bw * hold
+            elif measured:
+                blocked += 1
+                blocked_bw += bw
+            if measured:
+                arrivals += 1
+                offered_bw += bw
+            seq += 1
+        else:
+            continue
+        break
+
+    seconds = time.perf_counter() - start
+    span = max(last - warmup, 1e-12)
+    link_util = area / span / state.capacity
+    return {'policy': policy, 'arrivals': arrivals, 'blocked': blocked,
+            'blocking_probability': blocked / arrivals if arrivals else 0.0,
+            'bandwidth_blocking': blocked_bw / offered_bw if offered_bw else 0.0,
+            'throughput': (arrivals - blocked) / span, 'carried_load': carried / span,
+            'link_utilization': link_util,
+            'samples': (np.asarray(sample_times), np.asarray(samples, dtype=np.float32).reshape(-1, state.num_edges)),
+            'sim_time': now, 'events': events, 'seconds': seconds}
+
+
+def summary(result):
+    util = result['link_utilization']
+    return "\n".join([
+        f"Policy: {result['policy']}",
+        f"Arrivals: {result['arrivals']}, blocked: {result['blocked']} "
+        f"(blocking probability = {result['blocking_probability']:.4f}, "
+        f"bandwidth blocking = {result['bandwidth_blocking']:.4f})",
+        f"Throughput: {result['throughput']:.2f} demands/đơn vị thời gian, "
+        f"carried load: {result['carried_load']:.1f} Mbps",
+        f"Utilization trung bình: {util.mean() * 100:.1f}%, link cao nhất: {util.max() * 100:.1f}%",
+        f"{result['events']} sự kiện trong {result['seconds']:.2f}s "
+        f"({result['events'] / max(result['seconds'], 1e-9):.0f} sự kiện/s)",
+    ])
+
+
+# 4. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="Mô phỏng sự kiện rời rạc: arrival Poisson, holding time mũ")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('--demands', default=None, help="File demands CSV/JSONL làm nguồn cặp node và bandwidth")
+    parser.add_argument('--trace', action='store_true', help="Phát lại demands đúng thứ tự thay vì lấy mẫu")
+    parser.add_argument('--policy', choices=POLICIES, default='fcfs')
+    parser.add_argument('--cost', choices=tuple(LINK_COSTS), default='linear', help="Hàm cost của policy load_aware")
+    parser.add_argument('--rate', type=float, default=10.0, help="Số arrival trên một đơn vị thời gian")
+    parser.add_argument('--holding', type=float, default=1.0, help="Holding time trung bình")
+    parser.add_argument('--arrivals', type=int, default=100000)
+    parser.add_argument('--warmup', type=float, default=0.0)
+    parser.add_argument('--sample-interval', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from path_index import load_path_index
+    from topology_cache import load_topology
+    state = load_topology(args.topology)
+    path_index = load_path_index(state, args.topology)
+    demands = None
+    if args.demands:
+        batches = list(iter_demand_batches(args.demands))
+        demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+
+    result = simulate(state, args.policy, args.rate, args.holding, args.arrivals, demands, args.trace,
+                      sample_interval=args.sample_interval, warmup=args.warmup, seed=args.seed,
+                      path_index=path_index, cost=args.cost)
+    path_index.save()
+    print(summary(result))
+
+
+if __name__ == "__main__":
+    main()
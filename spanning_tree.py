@@ -0,0 +1,86 @@
+import heapq
+import numpy as np
+
+
+# 1. Prim với heap (lazy) trên adjacency CSR: O(E log E)
+def prim_mst(state, start=0):
+    """MST (spanning forest nếu đồ thị không liên thông) theo distance.
+
+    start: chỉ số node bắt đầu. Trả về (mảng edge id theo thứ tự được chọn, tổng distance).
+    """
+    indptr, indices, edge_ids, distance = state.adjacency()
+    n = state.num_nodes
+    visited = bytearray(n)
+    eids = []
+    total = 0.0
+
+    for root in [start] + list(range(n)):
+        if visited[root]:
+            continue
+        visited[root] = 1
+        heap = [(distance[edge_ids[k]], indices[k], edge_ids[k]) for k in range(indptr[root], indptr[root + 1])]
+        heapq.heapify(heap)
+        while heap:
+            d, v, e = heapq.heappop(heap)
+            if visited[v]:
+                continue
+            visited[v] = 1
+            eids.append(e)
+            total += d
+            for k in range(indptr[v], indptr[v + 1]):
+                w = indices[k]
+                if not visited[w]:
+                    heapq.heappush(heap, (distance[edge_ids[k]], w, edge_ids[k]))
+        if len(eids) == n - 1:
+            break
+    return np.asarray(eids, dtype=np.int32), total
+
+
+# 2. Kruskal với union-find (nén đường đi kiểu halving) trên danh sách cạnh dạng mảng
+def kruskal_mst(state):
+    """Trả về (mảng edge id theo distance tăng dần, tổng distance)"""
+    parent = list(range(state.num_nodes))
+    src, dst, distance = state.src.tolist(), state.dst.tolist(), state.distance.tolist()
+    eids = []
+    total = 0.0
+    target = state.num_nodes - 1
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for e in np.argsort(state.distance, kind='stable').tolist():
+        ru, rv = find(src[e]), find(dst[e])
+        if ru == rv:
+            continue
+        parent[ru] = rv
+        eids.append(e)
+        total += distance[e]
+        if len(eids) == target:
+            break
+    return np.asarray(eids, dtype=np.int32), total
+
+
+# 3. Phiên bản gốc của MST.py (quét mọi láng giềng của mọi node đã thăm, O(V*E)), để so sánh
+def prim_mst_scan(graph, start_node=0):
+    visited = {start_node}
+    mst_edges = []
+    total_distance = 0
+    while len(visited) < graph.number_of_nodes():
+        min_edge = None
+        min_distance = float('inf')
+        for u in visited:
+            for v in graph.neighbors(u):
+                if v not in visited and graph.has_edge(u, v):
+                    distance = graph[u][v]['distance']
+                    if distance < min_distance:
+                        min_distance = distance
+                        min_edge = (u, v)
+        if min_edge is None:
+            break
+        visited.add(min_edge[1])
+        mst_edges.append(min_edge)
+        total_distance += min_distance
+    return mst_edges, total_distance
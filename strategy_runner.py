@@ -0,0 +1,252 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from admission import AdmissionEngine, LoadAwareRouter, widest_path
+from demand_stream import DEMAND_DTYPE, iter_demand_batches
+from ksp import KShortestPaths
+from network_state import NetworkState
+from path_index import PathIndex
+
+# Các cấu hình mặc định tương ứng với 3 script: FCFS.py, test2.py, Nmax.py
+DEFAULT_CONFIGS = [('shortest', 'arrival'), ('load_aware', 'bandwidth'), ('multipath', 'bandwidth_hops')]
+POLICIES = ('shortest', 'load_aware', 'multipath', 'widest', 'widest_split', 'maxflow_split')
+
+
+# 1. Mảng NumPy dùng chung giữa các process qua shared memory (chỉ đọc ở worker)
+class SharedArrays:
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+            self.blocks.append(shm)
+            self.spec[name] = (shm.name, arr.shape, arr.dtype)
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_arrays(spec):
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        # Process cha chịu trách nhiệm unlink khi kết thúc
+        shm = shared_memory.SharedMemory(name=shm_name)
+        arr = np.ndarray(shape, dtype, buffer=shm.buf)
+        arr.flags.writeable = False
+        blocks.append(shm)
+        arrays[name] = arr
+    return arrays, blocks
+
+
+def topology_arrays(state):
+    return {'src': state.src, 'dst': state.dst, 'distance': state.distance,
+            'capacity': state.capacity, 'indptr': state.indptr,
+            'indices': state.indices, 'edge_ids': state.edge_ids}
+
+
+def state_from_arrays(arrays, nodes):
+    """NetworkState mới (flow/residual riêng) trên topology dùng chung"""
+    return NetworkState(nodes, arrays['src'], arrays['dst'], arrays['distance'], arrays['capacity'],
+                        csr=(arrays['indptr'], arrays['indices'], arrays['edge_ids']))
+
+
+# 2. Chính sách định tuyến: admit(seq, source, target, bandwidth) -> True nếu được chấp nhận
+def make_policy(name, state, path_index):
+    if name == 'shortest':
+        # Gắn như observer để ResidualIndex theo kịp thay đổi ngoài engine (ví dụ link hỏng);
+        # người gọi detach các observer của policy khi xong (xem run_config)
+        engine = state.attach(AdmissionEngine(state, path_index))
+
+        def admit(seq, source, target, bandwidth):
+            return engine.admit(seq, source, target, bandwidth) is not None
+
+    elif name == 'load_aware':
+        router = LoadAwareRouter(state, 'linear', path_index)
+
+        def admit(seq, source, target, bandwidth):
+            found = router.route(state.node_index[source], state.node_index[target], bandwidth)
+            if found is None:
+                return False
+            state.reserve(found[1], bandwidth, seq)
+            return True
+
+    elif name == 'multipath':
+        from Nmax import smart_multipath_routing, smart_weight
+        ksp = KShortestPaths(state, k=12, weight=smart_weight)
+
+        def admit(seq, source, target, bandwidth):
+            paths = smart_multipath_routing(state, source, target, bandwidth, ksp=ksp)
+            if not paths:
+                return False
+            for _, eids, allocated_bw in paths:
+                state.reserve(eids, allocated_bw, seq)
+            return True
+
+        # Cache tập đường ứng viên phụ thuộc lịch sử residual: cho phép người gọi xóa (ví dụ survivability)
+        admit.clear = ksp.clear
+
+    elif name == 'widest':
+        def admit(seq, source, target, bandwidth):
+            # Một Dijkstra bottleneck: nếu đường rộng nhất không đủ thì không đường nào đủ
+            found = widest_path(state, state.node_index[source], state.node_index[target])
+            if found is None or found[0] < bandwidth:
+                return False
+            state.reserve(found[2], bandwidth, seq)
+            return True
+
+    elif name in ('widest_split', 'maxflow_split'):
+        from Nmax import smart_multipath_routing
+        from maxflow import MaxFlowSplitter
+        mode = name[:-len('_split')]
+        splitter = MaxFlowSplitter(state) if mode == 'maxflow' else None
+
+        def admit(seq, source, target, bandwidth):
+            paths = smart_multipath_routing(state, source, target, bandwidth, mode=mode, splitter=splitter)
+            if not paths:
+                return False
+            for _, eids, allocated_bw in paths:
+                state.reserve(eids, allocated_bw, seq)
+            return True
+
+    else:
+        raise ValueError(f"Không có strategy '{name}', chọn một trong {POLICIES}")
+    return admit
+
+
+# 3. Thứ tự xử lý demands: arrival, bandwidth, bandwidth_hops, random:<seed>
+def order_demands(demands, hops, ordering):
+    if ordering == 'arrival':
+        return np.arange(len(demands))
+    if ordering == 'bandwidth':
+        return np.argsort(demands['bandwidth'], kind='stable')
+    if ordering == 'bandwidth_hops':
+        return np.argsort(demands['bandwidth'] * hops, kind='stable')
+    if ordering.startswith('random'):
+        _, _, seed = ordering.partition(':')
+        return np.random.default_rng(int(seed or 0)).permutation(len(demands))
+    raise ValueError(f"Không có ordering '{ordering}'")
+
+
+def demand_hops(state, demands):
+    """Số hop của shortest path (theo distance) cho từng demand, inf nếu không có đường"""
+    path_index = PathIndex(state, k=1)
+    hops = np.full(len(demands), np.inf)
+    for i, (s, t) in enumerate(zip(demands['source'].tolist(), demands['target'].tolist())):
+        if s in state.node_index and t in state.node_index:
+            candidates = path_index.candidates(state.node_index[s], state.node_index[t])
+            if candidates:
+                hops[i] = len(candidates[0])
+    return hops
+
+
+def run_config(state, demands, hops, policy, ordering, path_index=None):
+    """Chạy một cấu hình trên state (đã reset), trả về một dòng của bảng so sánh.
+
+    path_index: PathIndex đã gắn với state (mặc định dựng mới).
+    """
+    start = time.perf_counter()
+    state.reset()
+    attached = len(state.observers)
+    accepted = 0
+    accepted_bw = 0.0
+    try:
+        admit = make_policy(policy, state, path_index or PathIndex(state))
+        for i in order_demands(demands, hops, ordering).tolist():
+            seq, source, target, bandwidth = demands[i].tolist()
+            if source not in state.node_index or target not in state.node_index:
+                continue
+            if admit(seq, source, target, bandwidth):
+                accepted += 1
+                accepted_bw += bandwidth
+    finally:
+        # State được dùng lại cho cấu hình sau: bỏ các observer của policy này (router, engine, splitter)
+        for observer in state.observers[attached:]:
+            state.detach(observer)
+
+    util = state.utilization()
+    return {'policy': policy, 'ordering': ordering, 'accepted': accepted, 'demands': len(demands),
+            'accepted_bw': accepted_bw, 'avg_util': float(util.mean() * 100) if len(util) else 0.0,
+            'links_over_70': int(np.count_nonzero(util > 0.7)),
+            'seconds': time.perf_counter() - start}
+
+
+# 4. Worker của process pool: gắn topology + demands từ shared memory một lần
+_WORKER = {}
+
+
+def _init_worker(spec, nodes):
+    arrays, blocks = attach_arrays(spec)
+    _WORKER['blocks'] = blocks
+    _WORKER['arrays'] = arrays
+    _WORKER['state'] = state_from_arrays(arrays, nodes)
+
+
+def _run_in_worker(config):
+    arrays = _WORKER['arrays']
+    return run_config(_WORKER['state'], arrays['demands'], arrays['hops'], *config)
+
+
+def run_strategies(state, demands, configs=DEFAULT_CONFIGS, workers=None):
+    """Chạy song song các cấu hình (policy, ordering), trả về list dòng kết quả theo thứ tự configs"""
+    demands = np.asarray(demands, dtype=DEMAND_DTYPE) if not isinstance(demands, np.ndarray) else demands
+    configs = list(configs)
+    hops = demand_hops(state, demands)
+
+    if workers == 1 or len(configs) <= 1:
+        local = state_from_arrays(topology_arrays(state), state.nodes)
+        return [run_config(local, demands, hops, *config) for config in configs]
+
+    arrays = dict(topology_arrays(state), demands=demands, hops=hops)
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(shared.spec, state.nodes)) as pool:
+            return list(pool.map(_run_in_worker, configs))
+
+
+def format_table(rows):
+    header = f"{'Policy':<14} {'Ordering':<16} {'Accepted':>10} {'BW (Mbps)':>11} {'Avg util':>9} {'>70%':>5} {'Time (s)':>9}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(f"{r['policy']:<14} {r['ordering']:<16} {r['accepted']:>5}/{r['demands']:<4} "
+                     f"{r['accepted_bw']:>11.1f} {r['avg_util']:>8.1f}% {r['links_over_70']:>5} {r['seconds']:>9.2f}")
+    return "\n".join(lines)
+
+
+# 5. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="So sánh các chiến lược admission song song")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('demands', help="File demands CSV hoặc JSONL")
+    parser.add_argument('--policies', nargs='+', default=list(POLICIES), choices=POLICIES)
+    parser.add_argument('--orderings', nargs='+', default=['arrival', 'bandwidth', 'bandwidth_hops'])
+    parser.add_argument('--seeds', type=int, default=0, help="Thêm N ordering ngẫu nhiên random:0..N-1")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    from topology_cache import load_topology
+    state = load_topology(args.topology)
+    batches = list(iter_demand_batches(args.demands))
+    demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+
+    orderings = list(args.orderings) + [f"random:{seed}" for seed in range(args.seeds)]
+    configs = [(p, o) for p in args.policies for o in orderings]
+    print(format_table(run_strategies(state, demands, configs, args.workers)))
+
+
+if __name__ == "__main__":
+    main()
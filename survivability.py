@@ -0,0 +1,219 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
+
+from demand_stream import DEMAND_DTYPE, iter_demand_batches
+from instrumentation import PROFILER
+from path_index import PathIndex
+from strategy_runner import POLICIES, demand_hops, make_policy, order_demands, state_from_arrays, topology_arrays
+
+
+# 1. Trạng thái gốc: chạy admission một lần, giữ demandsID của từng link
+def admit_all(state, demands, policy='shortest', ordering='arrival', path_index=None):
+    """Chạy admission trên state (reset trước), số demand được chấp nhận"""
+    hops = demand_hops(state, demands) if ordering == 'bandwidth_hops' else None
+    state.reset()
+    attached = len(state.observers)
+    try:
+        admit = make_policy(policy, state, path_index or PathIndex(state))
+        accepted = 0
+        for i in order_demands(demands, hops, ordering).tolist():
+            seq, source, target, bandwidth = demands[i].tolist()
+            if source in state.node_index and target in state.node_index:
+                accepted += bool(admit(seq, source, target, bandwidth))
+    finally:
+        # Bỏ các observer của policy (router, engine), kể cả khi policy lỗi
+        for observer in state.observers[attached:]:
+            state.detach(observer)
+    return accepted
+
+
+# 2. Một lần hỏng link: chỉ reroute các demand đi qua link hỏng, rồi hoàn tác về trạng thái gốc
+class Survivability:
+    """Phân tích link hỏng trên state đã admission xong.
+
+    fail() gỡ các demand có trong demandsID của link hỏng, đặt capacity link hỏng về 0, reroute
+    chúng (theo thứ tự được chấp nhận ban đầu) rồi khôi phục state: chi phí mỗi lần hỏng tỉ lệ với
+    số demand bị ảnh hưởng, không phải chạy lại toàn bộ admission. Policy dựng một lần và gắn vào
+    state như observer, nên ResidualIndex / trọng số của nó theo kịp khi link bị gỡ và khôi phục;
+    cache đường của policy (nếu có) được xóa sau mỗi lần hỏng để kết quả không phụ thuộc thứ tự xử lý
+    các lần hỏng hay cách chia cho worker.
+    """
+
+    def __init__(self, state, demands, policy='shortest', path_index=None):
+        self.state = state
+        self.attached = len(state.observers)
+        self.admit = make_policy(policy, state, path_index or PathIndex(state))
+        self.demands = {seq: (source, target, bandwidth)
+                        for seq, source, target, bandwidth in demands.tolist()}
+        self.rank = {seq: i for i, seq in enumerate(state.reservations)}
+        self.capacity = state.capacity.copy()
+        self.flow = state.flow.copy()
+        self.residual = state.residual.copy()
+
+    def affected(self, failed):
+        """Các demand đang dùng ít nhất một link hỏng, theo thứ tự được chấp nhận"""
+        seqs = set()
+        for e in failed:
+            seqs.update(self.state.demand_ids[e])
+        return sorted(seqs, key=self.rank.get)
+
+    def _notify(self, eids):
+        for observer in self.state.observers:
+            observer.update(eids)
+
+    def close(self):
+        """Bỏ các observer của policy khỏi state"""
+        for observer in self.state.observers[self.attached:]:
+            self.state.detach(observer)
+
+    def fail(self, failed):
+        """Kết quả một tổ hợp link hỏng: số demand / bandwidth bị ảnh hưởng và còn sống sau reroute"""
+        state = self.state
+        failed = list(failed)
+        with PROFILER.phase('failure', links=len(failed)):
+            seqs = self.affected(failed)
+            saved = {seq: list(state.reservations[seq]) for seq in seqs}
+            for seq in seqs:
+                state.teardown(seq)
+            state.capacity[failed] = 0.0
+            state.residual[failed] = 0.0
+            self._notify(failed)
+
+            survived, survived_bw = [], 0.0
+            for seq in seqs:
+                source, target, bandwidth = self.demands[seq]
+                if self.admit(seq, source, target, bandwidth):
+                    survived.append(seq)
+                    survived_bw += bandwidth
+            if hasattr(self.admit, 'clear'):
+                self.admit.clear()
+
+            # Hoàn tác: gỡ các đường mới, reserve lại đường cũ, rồi chép giá trị gốc (không sai số cộng dồn)
+            touched = set(failed)
+            for seq in survived:
+                for eids, _ in state.reservations[seq]:
+                    touched.update(np.asarray(eids).tolist())
+                state.teardown(seq)
+            for seq in seqs:
+                for eids, bandwidth in saved[seq]:
+                    touched.update(np.asarray(eids).tolist())
+                    state.reserve(eids, bandwidth, seq)
+            touched = np.fromiter(touched, dtype=np.intp, count=len(touched))
+            state.capacity[touched] = self.capacity[touched]
+            state.flow[touched] = self.flow[touched]
+            state.residual[touched] = self.residual[touched]
+            self._notify(touched)
+
+        return {'failed': tuple(failed),
+                'links': ' + '.join(f"{u}-{v}" for u, v in map(state.edge_label, failed)),
+                'affected': len(seqs), 'survived': len(survived),
+                'affected_bw': sum(self.demands[seq][2] for seq in seqs), 'survived_bw': survived_bw,
+                'lost': sorted(set(seqs) - set(survived), key=self.rank.get)}
+
+
+def failure_sets(num_edges, failures=1):
+    """Mọi tổ hợp 1 link (và 2 link nếu failures=2)"""
+    return [failed for n in range(1, failures + 1) for failed in combinations(range(num_edges), n)]
+
+
+# 3. Chạy song song: worker kế thừa state gốc copy-on-write (fork), mỗi worker xử lý một phần các lần hỏng
+_WORKER = {}
+
+
+def _init_worker(arrays, nodes, reservations, demands, policy):
+    """Không có fork (Windows): dựng lại state gốc từ các bản ghi reserve, không chạy lại admission"""
+    state = state_from_arrays(arrays, nodes)
+    for seq, records in reservations:
+        for eids, bandwidth in records:
+            state.reserve(eids, bandwidth, seq)
+    _WORKER['sweep'] = Survivability(state, demands, policy)
+
+
+def _run_chunk(failures):
+    sweep = _WORKER['sweep']
+    return [sweep.fail(failed) for failed in failures]
+
+
+def survivability(state, demands, policy='shortest', ordering='arrival', failures=1, workers=None):
+    """Chạy admission một lần rồi phân tích mọi lần hỏng; trả về (số demand được chấp nhận, list kết quả)"""
+    demands = np.asarray(demands, dtype=DEMAND_DTYPE) if not isinstance(demands, np.ndarray) else demands
+    # Đường ứng viên không phụ thuộc capacity: dùng chung giữa lần chạy gốc và mọi lần hỏng
+    path_index = PathIndex(state)
+    accepted = admit_all(state, demands, policy, ordering, path_index)
+    sweep = Survivability(state, demands, policy, path_index)
+    cases = failure_sets(state.num_edges, failures) if isinstance(failures, int) else list(failures)
+    workers = workers or os.cpu_count()
+
+    if workers == 1 or len(cases) <= 1:
+        rows = [sweep.fail(failed) for failed in cases]
+        sweep.close()
+        return accepted, rows
+
+    chunks = [cases[i::workers * 4] for i in range(min(workers * 4, len(cases)))]
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _WORKER['sweep'] = sweep
+        context, initializer, initargs = multiprocessing.get_context('fork'), None, ()
+    else:
+        arrays = dict(topology_arrays(state), capacity=sweep.capacity)
+        initializer = _init_worker
+        initargs = (arrays, state.nodes, list(state.reservations.items()), demands, policy)
+        context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=initializer,
+                                 initargs=initargs) as pool:
+            rows = [row for chunk in pool.map(_run_chunk, chunks) for row in chunk]
+    finally:
+        _WORKER.clear()
+        sweep.close()
+    # Trả về theo thứ tự cases
+    order = {failed: i for i, failed in enumerate(cases)}
+    return accepted, sorted(rows, key=lambda row: order[row['failed']])
+
+
+# 4. Báo cáo
+def format_report(accepted, rows, top=None):
+    total = len(rows)
+    full = sum(1 for r in rows if r['survived'] == r['affected'])
+    affected = sum(r['affected'] for r in rows)
+    survived = sum(r['survived'] for r in rows)
+    lines = [f"Demands được chấp nhận ban đầu: {accepted}",
+             f"Số tổ hợp link hỏng: {total}, giữ được mọi demand: {full}",
+             f"Demand bị ảnh hưởng: {affected}, sống sót sau reroute: {survived}"
+             + (f" ({survived / affected * 100:.1f}%)" if affected else "")]
+    width = max([len('Link hỏng')] + [len(r['links']) for r in rows])
+    header = f"{'Link hỏng':<{width}} {'Ảnh hưởng':>10} {'Sống sót':>9} {'Mất':>5} {'BW mất (Mbps)':>14}"
+    lines += ["", header, "-" * len(header)]
+    worst = sorted(rows, key=lambda r: (r['survived'] - r['affected'], -r['affected']))
+    for r in worst[:top]:
+        lines.append(f"{r['links']:<{width}} {r['affected']:>10} {r['survived']:>9} {len(r['lost']):>5} "
+                     f"{r['affected_bw'] - r['survived_bw']:>14.1f}")
+    return "\n".join(lines)
+
+
+# 5. Chạy từ dòng lệnh
+def main():
+    parser = argparse.ArgumentParser(description="Phân tích khả năng sống sót khi hỏng link (reroute tăng dần)")
+    parser.add_argument('topology', help="File GML (ví dụ AttMpls.gml)")
+    parser.add_argument('demands', help="File demands CSV hoặc JSONL")
+    parser.add_argument('--policy', default='shortest', choices=POLICIES)
+    parser.add_argument('--ordering', default='arrival')
+    parser.add_argument('--failures', type=int, default=1, choices=(1, 2), help="Hỏng đồng thời tối đa N link")
+    parser.add_argument('--top', type=int, default=20, help="Số tổ hợp tệ nhất in ra (0 = tất cả)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    from topology_cache import load_topology
+    state = load_topology(args.topology)
+    batches = list(iter_demand_batches(args.demands))
+    demands = np.concatenate(batches) if batches else np.zeros(0, dtype=DEMAND_DTYPE)
+
+    accepted, rows = survivability(state, demands, args.policy, args.ordering, args.failures, args.workers)
+    print(format_report(accepted, rows, args.top or None))
+
+
+if __name__ == "__main__":
+    main()
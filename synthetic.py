@@ -0,0 +1,185 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from demand_stream import DEMAND_DTYPE
+from geo import capacity_tiers, edge_distances
+from network_state import NetworkState
+from spanning_tree import kruskal_mst
+
+# Khung tọa độ mặc định: lục địa Hoa Kỳ (giống vùng của AttMpls)
+US_BOUNDS = ((25.0, 49.0), (-125.0, -67.0))
+# Bandwidth demand mặc định: số nguyên 2..9 Mbps (giống AttDemand.csv)
+DEMAND_BANDWIDTH = (2, 9)
+
+
+# 1. Tọa độ ngẫu nhiên và chuyển sang tọa độ 3D trên mặt cầu đơn vị
+def random_coordinates(n, rng, bounds=US_BOUNDS):
+    (lat_min, lat_max), (lon_min, lon_max) = bounds
+    return rng.uniform(lat_min, lat_max, n), rng.uniform(lon_min, lon_max, n)
+
+
+def unit_vectors(latitude, longitude):
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def patch_area(bounds=US_BOUNDS):
+    """Diện tích vùng tọa độ trên mặt cầu đơn vị"""
+    (lat_min, lat_max), (lon_min, lon_max) = bounds
+    return (np.sin(np.radians(lat_max)) - np.sin(np.radians(lat_min))) * np.radians(lon_max - lon_min)
+
+
+def radius_for_degree(n, degree, bounds=US_BOUNDS):
+    """Bán kính (trên mặt cầu đơn vị) chứa trung bình degree node khác khi n node phân bố đều"""
+    return float(np.sqrt(degree * patch_area(bounds) / (np.pi * max(n - 1, 1))))
+
+
+def state_from_edges(latitude, longitude, src, dst):
+    """NetworkState từ danh sách cạnh: distance Haversine, capacity theo bậc khoảng cách"""
+    distance = edge_distances(latitude, longitude, src, dst)
+    return NetworkState(range(len(latitude)), src, dst, distance, capacity_tiers(distance),
+                        latitude, longitude)
+
+
+def connect_components(n, pairs, longitude):
+    """Thêm cạnh nối các thành phần liên thông (theo thứ tự kinh độ của node đại diện)"""
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    count, labels = connected_components(graph, directed=False)
+    if count <= 1:
+        return pairs
+    representative = np.unique(labels, return_index=True)[1]
+    representative = representative[np.argsort(longitude[representative], kind='stable')]
+    bridges = np.sort(np.column_stack([representative[:-1], representative[1:]]), axis=1)
+    return np.unique(np.concatenate([pairs, bridges]), axis=0)
+
+
+def knn_pairs(points, k):
+    """Cặp (i, j), i < j, với j thuộc k node gần i nhất (bỏ cặp trùng)"""
+    n = len(points)
+    k = min(k, n - 1)
+    _, nearest = cKDTree(points).query(points, k=k + 1)
+    src = np.repeat(np.arange(n), k)
+    dst = nearest[:, 1:].ravel()
+    return np.unique(np.sort(np.column_stack([src, dst]), axis=1), axis=0)
+
+
+# 2. Các topology địa lý (node là 0..n-1, liên thông, capacity theo khoảng cách)
+def geographic_knn(n, k=3, seed=0, bounds=US_BOUNDS):
+    """Mỗi node nối tới k node gần nhất"""
+    rng = np.random.default_rng(seed)
+    lat, lon = random_coordinates(n, rng, bounds)
+    pairs = connect_components(n, knn_pairs(unit_vectors(lat, lon), k), lon)
+    return state_from_edges(lat, lon, pairs[:, 0], pairs[:, 1])
+
+
+def random_geometric(n, degree=4.0, seed=0, bounds=US_BOUNDS):
+    """Nối mọi cặp node cách nhau không quá bán kính cho bậc trung bình degree"""
+    rng = np.random.default_rng(seed)
+    lat, lon = random_coordinates(n, rng, bounds)
+    pairs = cKDTree(unit_vectors(lat, lon)).query_pairs(radius_for_degree(n, degree, bounds), output_type='ndarray')
+    pairs = connect_components(n, pairs.reshape(-1, 2), lon)
+    return state_from_edges(lat, lon, pairs[:, 0], pairs[:, 1])
+
+
+def waxman(n, degree=4.0, alpha=0.5, seed=0, bounds=US_BOUNDS):
+    """Waxman cục bộ: cặp cách nhau d được nối với xác suất beta * exp(-d / (alpha * r)).
+
+    Chỉ xét các cặp trong bán kính r (trung bình 6 * degree láng giềng) để chạy được tới 10^6 node;
+    beta được chọn để bậc trung bình xấp xỉ degree.
+    """
+    rng = np.random.default_rng(seed)
+    lat, lon = random_coordinates(n, rng, bounds)
+    points = unit_vectors(lat, lon)
+    radius = radius_for_degree(n, 6 * degree, bounds)
+    scale = alpha * radius
+    x = radius / scale
+    density = max(n - 1, 1) / patch_area(bounds)
+    beta = min(degree / (density * 2 * np.pi * scale ** 2 * (1 - np.exp(-x) * (1 + x))), 1.0)
+
+    pairs = cKDTree(points).query_pairs(radius, output_type='ndarray').reshape(-1, 2)
+    d = np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1)
+    pairs = pairs[rng.random(len(pairs)) < beta * np.exp(-d / scale)]
+    pairs = connect_components(n, pairs, lon)
+    return state_from_edges(lat, lon, pairs[:, 0], pairs[:, 1])
+
+
+def zoo_like(n, extra=0.25, seed=0, bounds=US_BOUNDS, spread=1.5):
+    """Giống các backbone trong Topology Zoo: PoP gom quanh các đô thị, cây khung ngắn nhất
+    cộng thêm extra * n link dự phòng (bậc trung bình khoảng 2.5).
+
+    spread: độ lệch chuẩn (độ) của PoP quanh đô thị, mỗi đô thị trung bình 25 PoP.
+    """
+    rng = np.random.default_rng(seed)
+    (lat_min, lat_max), (lon_min, lon_max) = bounds
+    city_lat, city_lon = random_coordinates(max(n // 25, 1), rng, bounds)
+    city = rng.integers(0, len(city_lat), n)
+    lat = np.clip(city_lat[city] + rng.normal(0, spread, n), lat_min, lat_max)
+    lon = np.clip(city_lon[city] + rng.normal(0, spread, n), lon_min, lon_max)
+
+    pairs = connect_components(n, knn_pairs(unit_vectors(lat, lon), 4), lon)
+    tree, _ = kruskal_mst(state_from_edges(lat, lon, pairs[:, 0], pairs[:, 1]))
+    rest = np.setdiff1d(np.arange(len(pairs)), tree)
+    chosen = rng.choice(rest, size=min(int(extra * n), len(rest)), replace=False)
+    pairs = pairs[np.sort(np.concatenate([tree, chosen]))]
+    return state_from_edges(lat, lon, pairs[:, 0], pairs[:, 1])
+
+
+TOPOLOGIES = {'knn': geographic_knn, 'geometric': random_geometric, 'waxman': waxman, 'zoo': zoo_like}
+
+
+# 3. Ma trận demand (mảng DEMAND_DTYPE, seq 0..m-1, source/target là node label của state)
+def _draw_pairs(rng, n, m, p_source=None, p_target=None):
+    """m cặp (source, target) khác nhau theo chỉ số node, rút lại các cặp source == target"""
+    if n < 2:
+        raise ValueError("Cần ít nhất 2 node để sinh demand")
+    sources = rng.choice(n, m, p=p_source)
+    targets = rng.choice(n, m, p=p_target)
+    same = np.nonzero(sources == targets)[0]
+    while len(same):
+        targets[same] = rng.choice(n, len(same), p=p_target)
+        same = same[sources[same] == targets[same]]
+    return sources, targets
+
+
+def _demand_array(state, rng, sources, targets, bandwidth):
+    labels = np.asarray(state.nodes)
+    demands = np.zeros(len(sources), dtype=DEMAND_DTYPE)
+    demands['seq'] = np.arange(len(sources))
+    demands['source'] = labels[sources]
+    demands['target'] = labels[targets]
+    demands['bandwidth'] = rng.integers(bandwidth[0], bandwidth[1] + 1, len(sources))
+    return demands
+
+
+def uniform_demands(state, m, seed=0, bandwidth=DEMAND_BANDWIDTH):
+    """Mọi cặp node có xác suất như nhau"""
+    rng = np.random.default_rng(seed)
+    return _demand_array(state, rng, *_draw_pairs(rng, state.num_nodes, m), bandwidth)
+
+
+def gravity_demands(state, m, seed=0, bandwidth=DEMAND_BANDWIDTH, sigma=1.0):
+    """Mô hình gravity: mỗi node có khối lượng log-normal, P(s, t) tỉ lệ với w_s * w_t"""
+    rng = np.random.default_rng(seed)
+    weight = rng.lognormal(0.0, sigma, state.num_nodes)
+    weight /= weight.sum()
+    return _demand_array(state, rng, *_draw_pairs(rng, state.num_nodes, m, weight, weight), bandwidth)
+
+
+def hotspot_demands(state, m, seed=0, bandwidth=DEMAND_BANDWIDTH, hotspots=0.01, fraction=0.5):
+    """Tỉ lệ fraction demands có target thuộc một nhóm nhỏ node nóng (hotspots * n node, ít nhất 1)"""
+    rng = np.random.default_rng(seed)
+    n = state.num_nodes
+    sources, targets = _draw_pairs(rng, n, m)
+    hot = rng.choice(n, max(int(hotspots * n), 1), replace=False)
+    to_hot = np.nonzero(rng.random(m) < fraction)[0]
+    targets[to_hot] = hot[rng.integers(0, len(hot), len(to_hot))]
+    same = np.nonzero(sources == targets)[0]
+    while len(same):
+        sources[same] = rng.integers(0, n, len(same))
+        same = same[sources[same] == targets[same]]
+    return _demand_array(state, rng, sources, targets, bandwidth)
+
+
+DEMAND_MODELS = {'uniform': uniform_demands, 'gravity': gravity_demands, 'hotspot': hotspot_demands}
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import re
+import numpy as np
+from network_state import NetworkState
+
+# Đổi số này khi thay đổi cách tính distance/capacity để các cache cũ tự mất hiệu lực
+CACHE_VERSION = 1
+
+
+# 1. Hash nội dung file GML
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}".encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+# 2. Lưu / đọc NetworkState dạng .npz (không nén)
+def save_state(state, cache_path):
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(tmp_path, nodes=np.asarray(state.nodes), src=state.src, dst=state.dst,
+             distance=state.distance, capacity=state.capacity,
+             latitude=state.latitude, longitude=state.longitude)
+    os.replace(tmp_path, cache_path)
+
+
+def load_state(cache_path):
+    with np.load(cache_path, allow_pickle=False) as data:
+        return NetworkState(data['nodes'].tolist(), data['src'], data['dst'],
+                            data['distance'], data['capacity'],
+                            data['latitude'], data['longitude'])
+
+
+# 3. Đường dẫn file cache của một file GML: <cache_dir>/<stem>-<hash><suffix>
+def cache_file(gml_path, suffix='.npz', cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(gml_path)), '.topology_cache')
+    stem = os.path.splitext(os.path.basename(gml_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{file_digest(gml_path)}{suffix}")
+
+
+def remove_stale(cache_path, suffix='.npz'):
+    """Xóa các cache cùng tên gốc nhưng khác hash (file GML đã thay đổi)"""
+    cache_dir, name = os.path.split(cache_path)
+    stem = name[:-(len(suffix) + 17)]
+    pattern = re.escape(stem) + r'-[0-9a-f]{16}' + re.escape(suffix)
+    for other in os.listdir(cache_dir):
+        if other != name and re.fullmatch(pattern, other):
+            os.remove(os.path.join(cache_dir, other))
+
+
+# 4. Đọc topology: dùng cache nếu file GML chưa đổi, ngược lại parse lại và ghi cache
+def load_topology(gml_path, cache_dir=None):
+    """NetworkState của file GML (node id làm label), cache theo hash nội dung file"""
+    cache_path = cache_file(gml_path, cache_dir=cache_dir)
+
+    if os.path.exists(cache_path):
+        return load_state(cache_path)
+
+    import networkx as nx
+    state = NetworkState.from_graph(nx.read_gml(gml_path, label='id'))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    remove_stale(cache_path)
+    save_state(state, cache_path)
+    return state